@@ -0,0 +1,195 @@
+from quart import Quart, g, request, jsonify, make_response, send_file
+from main import (
+    INDEX_HTML,
+    LIMITS_ERROR,
+    SESSION_COOKIE,
+    SESSION_MAX_AGE,
+    SSE_HEADERS,
+    chat_payload,
+    create_agent,
+    format_sse,
+    get_latest_generated_images,
+    image_cache_headers,
+    image_etag,
+    image_file,
+    request_limits,
+    resolve_session_id,
+    session_thread_id,
+)
+import asyncio
+
+# Async (ASGI) variant of the Flask app in main.py. Every route awaits the
+# agent directly on the server's event loop, so a single process can hold
+# many in-flight conversations while the ReAct runs wait on Groq and the
+# MCP servers.
+app = Quart(__name__)
+
+# Agent and client live on the server loop for the lifetime of the process
+agent = None
+client = None
+_agent_lock = asyncio.Lock()
+
+
+async def get_agent():
+    """Create the agent on first use and return it"""
+    global agent, client
+
+    async with _agent_lock:
+        if agent is None:
+            agent, client = await create_agent()
+    return agent
+
+
+@app.before_request
+async def load_session():
+    g.session_id, g.new_session = resolve_session_id(
+        request.cookies.get(SESSION_COOKIE))
+
+
+@app.after_request
+async def save_session(response):
+    if getattr(g, "new_session", False):
+        response.set_cookie(SESSION_COOKIE, g.session_id,
+                            max_age=SESSION_MAX_AGE, httponly=True, samesite="Lax")
+    return response
+
+
+@app.after_serving
+async def shutdown():
+    """Close all MCP sessions when the server stops"""
+    if client is not None:
+        await client.close_all_sessions()
+
+
+@app.route('/generated_images/<filename>')
+async def serve_image(filename):
+    """Serve images with ETag/Last-Modified validators, 304s and byte ranges"""
+    try:
+        file_path = image_file(filename)
+        if file_path is None:
+            return jsonify({"error": "Image not found"}), 404
+
+        etag = await asyncio.to_thread(image_etag, file_path)
+        response = await send_file(file_path, add_etags=False)
+        response.set_etag(etag)
+        await response.make_conditional(request, accept_ranges=True)
+        image_cache_headers(filename, response.cache_control)
+        return response
+    except Exception as e:
+        return jsonify({"error": f"Error serving image: {str(e)}"}), 500
+
+
+@app.route('/latest_images')
+async def get_latest_images():
+    """Get the latest generated images"""
+    try:
+        images = get_latest_generated_images(5)
+        return jsonify({"images": images})  # Return latest 5 images
+    except Exception as e:
+        return jsonify({"error": f"Error getting images: {str(e)}"}), 500
+
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json()
+        user_input = data.get('input') if data else None
+        if not user_input:
+            return jsonify({"error": "No input provided"}), 400
+        try:
+            limits = request_limits(data)
+        except (TypeError, ValueError):
+            return jsonify({"error": LIMITS_ERROR}), 400
+
+        current_agent = await get_agent()
+        result = await current_agent.run(
+            user_input, thread_id=session_thread_id(g.session_id), **limits)
+        return jsonify(chat_payload(result))
+
+    except Exception as e:
+        return jsonify({"error": f"Error processing request: {str(e)}"}), 500
+
+
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Stream tokens, tool events and images as Server-Sent Events"""
+    try:
+        data = await request.get_json()
+        user_input = data.get('input') if data else None
+        if not user_input:
+            return jsonify({"error": "No input provided"}), 400
+        try:
+            limits = request_limits(data)
+        except (TypeError, ValueError):
+            return jsonify({"error": LIMITS_ERROR}), 400
+
+        current_agent = await get_agent()
+        thread_id = session_thread_id(g.session_id)
+
+        async def generate():
+            async for event in current_agent.stream(user_input, thread_id=thread_id, **limits):
+                yield format_sse(event).encode()
+
+        response = await make_response(
+            generate(), {"Content-Type": "text/event-stream", **SSE_HEADERS})
+        response.timeout = None  # ReAct runs outlive the default response timeout
+        return response
+
+    except Exception as e:
+        return jsonify({"error": f"Error processing request: {str(e)}"}), 500
+
+
+@app.route('/clear', methods=['POST'])
+async def clear():
+    try:
+        current_agent = await get_agent()
+        await current_agent.clear_conversation_history(
+            thread_id=session_thread_id(g.session_id))
+        return jsonify({"message": "Conversation history cleared"})
+
+    except Exception as e:
+        return jsonify({"error": f"Error clearing history: {str(e)}"}), 500
+
+
+@app.route('/memory_stats')
+async def memory_stats():
+    """Report live conversation threads and memory held by the agent"""
+    if agent is None:
+        return jsonify({})
+    return jsonify(agent.memory_stats())
+
+
+@app.route('/router_stats')
+async def router_stats():
+    """Report requests served by the intent router and what it saved"""
+    if agent is None:
+        return jsonify({})
+    return jsonify(agent.router_stats())
+
+
+@app.route('/llm_cache_stats')
+async def llm_cache_stats():
+    """Report model calls served from the LLM cache"""
+    if agent is None:
+        return jsonify({})
+    return jsonify(agent.llm_cache_stats())
+
+
+@app.route('/')
+async def index():
+    """Serve the main HTML page"""
+    return INDEX_HTML
+
+
+async def serve(host="0.0.0.0", port=5000):
+    """Run the ASGI app with Hypercorn.
+
+    Equivalent to ``hypercorn asgi_app:app --bind 0.0.0.0:5000``; any other
+    ASGI server (e.g. ``uvicorn asgi_app:app``) works as well.
+    """
+    from hypercorn.asyncio import serve as hypercorn_serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"{host}:{port}"]
+    await hypercorn_serve(app, config)
@@ -0,0 +1,86 @@
+"""Per-turn latency of conversation checkpointers.
+
+Runs a minimal LangGraph chat graph (one node that appends a reply of
+``--reply-words`` words) for ``--turns`` turns on each of ``--threads``
+threads and reports the per-turn latency of each checkpointer:
+
+- ``MemorySaver``: langgraph's unbounded in-process saver (the old default)
+- ``BoundedMemorySaver``: the LRU/TTL-bounded in-memory saver
+- ``SQLiteCheckpointSaver``: durable SQLite storage with batched writes
+
+Usage (from the repository root)::
+
+    python benchmarks/bench_checkpointer.py --turns 50 --threads 20
+
+The SQLite saver only marks threads dirty on the request path and writes
+them from a background thread, so its per-turn latency should track the
+in-memory savers; the "flush" line shows the cost paid off the request path.
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.graph import START, MessagesState, StateGraph  # noqa: E402
+
+from checkpointers import BoundedMemorySaver, SQLiteCheckpointSaver  # noqa: E402
+
+
+def build_graph(checkpointer, reply_words):
+    reply = " ".join(["word"] * reply_words)
+
+    def respond(state):
+        return {"messages": [AIMessage(content=reply)]}
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("respond", respond)
+    graph.add_edge(START, "respond")
+    return graph.compile(checkpointer=checkpointer)
+
+
+def run(name, checkpointer, args):
+    graph = build_graph(checkpointer, args.reply_words)
+    latencies = []
+    for turn in range(args.turns):
+        for thread in range(args.threads):
+            config = {"configurable": {"thread_id": f"thread-{thread}"}}
+            start = time.perf_counter()
+            graph.invoke({"messages": [HumanMessage(content=f"turn {turn}")]}, config)
+            latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    p95 = latencies[math.ceil(len(latencies) * 0.95) - 1]
+    print(f"{name:<22} mean={statistics.mean(latencies) * 1000:7.2f}ms  "
+          f"p50={statistics.median(latencies) * 1000:7.2f}ms  p95={p95 * 1000:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--reply-words", type=int, default=600,
+                        help="size of each reply, e.g. a long story")
+    args = parser.parse_args()
+
+    run("MemorySaver", MemorySaver(), args)
+    run("BoundedMemorySaver", BoundedMemorySaver(), args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = SQLiteCheckpointSaver(path=os.path.join(tmp, "bench.db"))
+        run("SQLiteCheckpointSaver", saver, args)
+        start = time.perf_counter()
+        saver.flush()
+        print(f"{'  final flush':<22} {(time.perf_counter() - start) * 1000:7.2f}ms  "
+              f"({saver.flushes} flushes, {saver.rows_written} rows written)")
+        saver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Bytes and requests saved by HTTP caching of generated images.
+
+Replays the page-load sequence (GET /latest_images, then GET every listed
+image) twice against the Flask app's test client:
+
+- first visit: a cold browser cache downloads everything
+- repeat visit: images with request-addressed names are still fresh
+  (public, max-age, no no-cache) and served from the browser cache with
+  no request at all; other images are revalidated with If-None-Match and answered with 304 Not Modified
+
+Before this change every repeat visit re-downloaded every image, so the
+"before" column equals the first visit. A Range request for the second
+half of one image is also checked.
+
+Usage (from the repository root, with images in generated_images/)::
+
+    python benchmarks/bench_image_cache.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def is_fresh(cache_control):
+    """Whether a browser may reuse the response without asking the server."""
+    return (not cache_control.no_cache and not cache_control.no_store
+            and bool(cache_control.max_age))
+
+
+def visit(client, cache):
+    """One page load; ``cache`` maps image URL -> (etag, fresh)."""
+    requests = bytes_sent = 0
+    listing = client.get('/latest_images')
+    requests += 1
+    bytes_sent += len(listing.data)
+
+    for name in listing.get_json()["images"]:
+        url = f'/generated_images/{name}'
+        etag, fresh = cache.get(url, (None, False))
+        if fresh:
+            continue
+        headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+        response = client.get(url, headers=headers)
+        requests += 1
+        bytes_sent += len(response.data)
+        if response.status_code == 200:
+            cache[url] = (response.get_etag()[0], is_fresh(response.cache_control))
+    return requests, bytes_sent
+
+
+def main_cli():
+    client = main.app.test_client()
+    cache = {}
+    first = visit(client, cache)
+    repeat = visit(client, cache)
+
+    print(f"{'':<14}{'requests':>10}{'bytes':>14}")
+    print(f"{'first visit':<14}{first[0]:>10}{first[1]:>14}")
+    print(f"{'repeat before':<14}{first[0]:>10}{first[1]:>14}")
+    print(f"{'repeat after':<14}{repeat[0]:>10}{repeat[1]:>14}")
+    print(f"saved per repeat visit: {first[0] - repeat[0]} requests, "
+          f"{first[1] - repeat[1]} bytes")
+
+    if cache:
+        url = next(iter(cache))
+        full = client.get(url).data
+        half = len(full) // 2
+        partial = client.get(url, headers={'Range': f'bytes={half}-'})
+        print(f"range request: status {partial.status_code}, "
+              f"{len(partial.data)} of {len(full)} bytes, "
+              f"matches={partial.data == full[half:]}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,142 @@
+"""Wall-clock time of multi-tool turns with pooled tool calls.
+
+Builds the agent's tools through ``MCPClient._make_pooled_tool`` on top of
+stub sessions whose ``call_tool`` sleeps for a fixed time per tool, so no
+MCP servers, Groq or Pollinations are needed. A turn asks for
+``write_story``, ``generate_image`` and ``search_web`` at once:
+
+- ``sequential``: the three calls awaited one after another
+- ``concurrent``: the calls run together by the ReAct agent's ToolNode,
+  compiled into a one-node graph
+- ``hung``: as ``concurrent``, but ``generate_image`` never returns and is
+  cut off by its ``--timeout``; the other results still come back
+
+Usage (from the repository root)::
+
+    python benchmarks/bench_parallel_tools.py --turns 5 --timeout 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage  # noqa: E402
+from langgraph.graph import START, MessagesState, StateGraph  # noqa: E402
+from langgraph.prebuilt import ToolNode  # noqa: E402
+from mcp.types import CallToolResult, TextContent, Tool  # noqa: E402
+
+from mcp_use import CallLimits, MCPClient  # noqa: E402
+
+# Seconds each stub tool takes, standing in for Groq, Pollinations and DDGS
+DELAYS = {"write_story": 3.0, "generate_image": 2.0, "search_web": 0.5}
+SERVERS = {"write_story": "storywriter", "generate_image": "imagegenerator",
+           "search_web": "duckduckgo-search"}
+
+
+class StubSession:
+    def __init__(self, delays):
+        self.delays = delays
+
+    async def call_tool(self, name, arguments):
+        await asyncio.sleep(self.delays[name])
+        return CallToolResult(content=[TextContent(type="text", text=f"{name} done")])
+
+
+class StubPool:
+    def __init__(self, delays):
+        self.session = StubSession(delays)
+
+    @asynccontextmanager
+    async def checkout(self):
+        yield self.session
+
+
+def build_tools(delays, timeout):
+    client = MCPClient()
+    pool = StubPool(delays)
+    tools = []
+    for name, server in SERVERS.items():
+        client.call_limits[server] = CallLimits(timeout=timeout)
+        schema = {"type": "object", "properties": {"topic": {"type": "string"}}}
+        tools.append(client._make_pooled_tool(
+            server, pool, Tool(name=name, description=name, inputSchema=schema)))
+    return client, tools
+
+
+def tool_calls_message():
+    return AIMessage(content="", tool_calls=[
+        {"name": name, "args": {"topic": "a lighthouse"}, "id": f"call_{i}", "type": "tool_call"}
+        for i, name in enumerate(SERVERS)
+    ])
+
+
+async def sequential_turn(tools):
+    for tool in tools:
+        await tool.ainvoke({"topic": "a lighthouse"})
+
+
+def tool_graph(tools):
+    """The ToolNode on its own in a graph, as the ReAct agent runs it
+    (ToolNode needs the graph's runtime config to be invoked)."""
+    graph = StateGraph(MessagesState)
+    graph.add_node("tools", ToolNode(tools))
+    graph.add_edge(START, "tools")
+    return graph.compile()
+
+
+async def concurrent_turn(graph):
+    result = await graph.ainvoke({"messages": [tool_calls_message()]})
+    return result["messages"][1:]
+
+
+async def timed(turn, turns):
+    latencies, output = [], None
+    for _ in range(turns):
+        start = time.perf_counter()
+        output = await turn()
+        latencies.append(time.perf_counter() - start)
+    return latencies, output
+
+
+def report(name, latencies):
+    print(f"{name:<11} mean={statistics.mean(latencies):6.2f}s  max={max(latencies):6.2f}s")
+
+
+async def run(args):
+    delays = {name: delay * args.scale for name, delay in DELAYS.items()}
+    print(f"tool delays: {', '.join(f'{n}={d:.2f}s' for n, d in delays.items())}\n")
+
+    _, tools = build_tools(delays, args.timeout)
+    report("sequential", (await timed(lambda: sequential_turn(tools), args.turns))[0])
+    report("concurrent", (await timed(lambda: concurrent_turn(tool_graph(tools)), args.turns))[0])
+
+    client, tools = build_tools({**delays, "generate_image": 3600}, args.timeout)
+    latencies, messages = await timed(lambda: concurrent_turn(tool_graph(tools)), args.turns)
+    report("hung", latencies)
+    for message in messages:
+        content = message.content
+        if content.startswith("{"):
+            content = json.loads(content)["status"]
+        print(f"  {message.name:<15} -> {content}")
+    print(f"  timeouts: {dict(client.timeouts)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=4.0,
+                        help="per-tool timeout in seconds")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply every stub tool delay")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
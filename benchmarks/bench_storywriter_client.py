@@ -0,0 +1,125 @@
+"""Per-call client overhead in storywriter_mcp: fresh vs shared ChatGroq.
+
+Starts a local fake Groq endpoint (an OpenAI-style chat completions server
+that answers instantly with ``--reply-words`` words, optionally after
+``--latency`` seconds) and points the story writer at it through
+``STORYWRITER_BASE_URL``. It then makes ``--calls`` sequential calls:
+
+- ``fresh``: a new ``ChatGroq`` per call, as the tools used to do
+- ``shared``: ``storywriter_mcp.get_llm()``, reusing one client and its
+  keep-alive connection pool
+
+Usage (from the repository root)::
+
+    python benchmarks/bench_storywriter_client.py --calls 200
+
+Since the fake server does no work, the difference between the two lines
+is the construction and connection setup cost saved per call. Against
+Groq the saving also includes a TLS handshake per call.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def start_fake_groq(port, reply_words, latency):
+    body = json.dumps({
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "bench",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": " ".join(["word"] * reply_words)},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 1, "completion_tokens": reply_words,
+                  "total_tokens": reply_words + 1},
+    }).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like Groq
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if latency:
+                time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def timed_calls(make_llm, calls):
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        await make_llm().ainvoke(f"Write a story about lighthouse {i}")
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def report(name, latencies):
+    p95 = latencies[math.ceil(len(latencies) * 0.95) - 1]
+    print(f"{name:<8} mean={statistics.mean(latencies) * 1000:7.2f}ms  "
+          f"p50={statistics.median(latencies) * 1000:7.2f}ms  p95={p95 * 1000:7.2f}ms")
+
+
+async def run(args):
+    import storywriter_mcp
+    from langchain_groq import ChatGroq
+
+    def fresh():
+        return ChatGroq(model=storywriter_mcp.STORY_MODEL, temperature=0.8,
+                        base_url=storywriter_mcp.GROQ_BASE_URL)
+
+    # One warm-up call each so imports and first connections are not timed
+    await timed_calls(fresh, 1)
+    await timed_calls(storywriter_mcp.get_llm, 1)
+
+    fresh_latencies = await timed_calls(fresh, args.calls)
+    shared_latencies = await timed_calls(storywriter_mcp.get_llm, args.calls)
+    report("fresh", fresh_latencies)
+    report("shared", shared_latencies)
+    saved = statistics.mean(fresh_latencies) - statistics.mean(shared_latencies)
+    print(f"\nsaved per call: {saved * 1000:.2f}ms")
+    await storywriter_mcp.http_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--reply-words", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated seconds per completion")
+    parser.add_argument("--port", type=int, default=5201)
+    args = parser.parse_args()
+
+    server = start_fake_groq(args.port, args.reply_words, args.latency)
+    os.environ["STORYWRITER_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Concurrency benchmark: Flask (WSGI) vs Quart (ASGI) serving /chat.
+
+Both apps are started in-process with a stub agent whose ``run`` sleeps for
+``--delay`` seconds, standing in for a ReAct run that waits on Groq and the
+MCP servers. The benchmark then fires ``--requests`` POST /chat calls with
+``--concurrency`` of them in flight at once and reports wall-clock time,
+throughput and latency percentiles for each mode.
+
+Usage (from the repository root)::
+
+    python benchmarks/bench_web_concurrency.py --requests 200 --concurrency 50
+
+What to expect: the Flask dev server runs one thread per request and funnels
+every run through the single background loop, so throughput is bounded by
+thread scheduling; the ASGI app awaits the runs directly on one loop and
+completes ``concurrency`` runs per ``delay`` with flat latency. Run with
+``--flask-threaded 0`` to reproduce a single-worker WSGI deployment, where
+requests are fully serialised.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import asgi_app  # noqa: E402
+from mcp_use import AgentResult  # noqa: E402
+
+
+class StubAgent:
+    """Stand-in for MCPAgent that simulates a slow, I/O-bound run."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def run(self, user_input, thread_id="default"):
+        await asyncio.sleep(self.delay)
+        return AgentResult(f"echo: {user_input}")
+
+    async def clear_conversation_history(self, thread_id="default"):
+        return None
+
+
+def start_flask(port, agent, threaded):
+    from werkzeug.serving import make_server
+
+    main.global_agent = agent
+    server = make_server("127.0.0.1", port, main.app, threaded=threaded)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_asgi(port, agent):
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    asgi_app.agent = agent
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    shutdown_event = None
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+
+    def run():
+        nonlocal shutdown_event
+        asyncio.set_event_loop(loop)
+        shutdown_event = asyncio.Event()
+        ready.set()
+        loop.run_until_complete(
+            serve(asgi_app.app, config, shutdown_trigger=shutdown_event.wait))
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return lambda: loop.call_soon_threadsafe(shutdown_event.set)
+
+
+def wait_until_up(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/latest_images", timeout=1)
+            return
+        except Exception:
+            time.sleep(0.05)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def post_chat(port, i):
+    body = json.dumps({"input": f"message {i}"}).encode()
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}/chat", data=body,
+        headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        resp.read()
+    return time.perf_counter() - start
+
+
+def run_load(port, total, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(lambda i: post_chat(port, i), range(total)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def report(name, wall, latencies):
+    p50 = statistics.median(latencies)
+    p95 = latencies[math.ceil(len(latencies) * 0.95) - 1]
+    print(f"{name:<8} wall={wall:7.2f}s  throughput={len(latencies) / wall:7.1f} req/s  "
+          f"p50={p50:6.2f}s  p95={p95:6.2f}s  max={latencies[-1]:6.2f}s")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--delay", type=float, default=1.0,
+                        help="simulated seconds per agent run")
+    parser.add_argument("--flask-threaded", type=int, default=1)
+    parser.add_argument("--port", type=int, default=5101)
+    args = parser.parse_args()
+
+    agent = StubAgent(args.delay)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.delay}s per run\n")
+
+    stop = start_flask(args.port, agent, bool(args.flask_threaded))
+    wait_until_up(args.port)
+    report("flask", *run_load(args.port, args.requests, args.concurrency))
+    stop()
+
+    stop = start_asgi(args.port + 1, agent)
+    wait_until_up(args.port + 1)
+    report("asgi", *run_load(args.port + 1, args.requests, args.concurrency))
+    stop()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,448 @@
+from collections import OrderedDict
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+import atexit
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _payload_size(obj) -> int:
+    """Approximate bytes held by a serialized checkpoint structure."""
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, (tuple, list)):
+        return sum(_payload_size(item) for item in obj)
+    if isinstance(obj, dict):
+        return sum(_payload_size(k) + _payload_size(v) for k, v in obj.items())
+    return 0
+
+
+def _saver_size(saver: MemorySaver) -> int:
+    return sum(
+        _payload_size(getattr(saver, attr, {}))
+        for attr in ("storage", "writes", "blobs")
+    )
+
+
+def _prune_saver(saver: MemorySaver):
+    """Keep only the latest checkpoint of each namespace, its pending writes
+    and the newest blob of each channel.
+
+    MemorySaver keeps every checkpoint of a thread, and each blob version
+    holds a channel's full value (the whole message list), so without this
+    a thread's state grows quadratically with its number of turns.
+    """
+    latest = {}
+    for thread_id, namespaces in saver.storage.items():
+        for ns, checkpoints in namespaces.items():
+            if not checkpoints:
+                continue
+            keep = max(checkpoints)
+            for checkpoint_id in [c for c in checkpoints if c != keep]:
+                del checkpoints[checkpoint_id]
+            latest[(thread_id, ns)] = keep
+    for key in [k for k in saver.writes if latest.get(k[:2]) != k[2]]:
+        del saver.writes[key]
+
+    blobs = getattr(saver, "blobs", None)
+    if blobs:
+        newest = {}
+        for thread_id, ns, channel, version in blobs:
+            channel_key = (thread_id, ns, channel)
+            if channel_key not in newest or version > newest[channel_key]:
+                newest[channel_key] = version
+        for key in [k for k in blobs if newest[k[:3]] != k[3]]:
+            del blobs[key]
+
+
+class _ThreadEntry:
+    __slots__ = ("saver", "nbytes", "last_access")
+
+    def __init__(self, saver: MemorySaver):
+        self.saver = saver
+        self.nbytes = 0
+        self.last_access = time.monotonic()
+
+
+class BoundedMemorySaver(BaseCheckpointSaver):
+    """In-memory checkpointer with LRU/TTL eviction and a memory cap.
+
+    Every conversation thread gets its own MemorySaver, kept in an LRU
+    ordered dict. Threads idle for longer than ``ttl_seconds`` are dropped,
+    and the least recently used threads are evicted whenever there are more
+    than ``max_threads`` of them or they hold more than ``max_bytes`` of
+    serialized state. Deleting a thread is a single dict pop.
+
+    Only the latest checkpoint of a thread is kept, so state history
+    (``list``) returns at most one checkpoint per thread.
+    """
+
+    def __init__(self, max_threads: int = 1000, ttl_seconds: float = 3600.0,
+                 max_bytes: int = 256 * 1024 * 1024, serde=None):
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._threads = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._versions = MemorySaver(serde=self.serde)
+
+    # Thread bookkeeping
+
+    @staticmethod
+    def _thread_id(config) -> str:
+        return config["configurable"]["thread_id"]
+
+    def _new_thread_saver(self, thread_id: str) -> MemorySaver:
+        return MemorySaver(serde=self.serde)
+
+    def _expire(self, now: float):
+        if not self.ttl_seconds:
+            return
+        while self._threads:
+            thread_id, entry = next(iter(self._threads.items()))
+            if now - entry.last_access < self.ttl_seconds:
+                break
+            self._evict(thread_id)
+
+    def _evict(self, thread_id: str):
+        entry = self._threads.pop(thread_id)
+        self._bytes -= entry.nbytes
+        self.evictions += 1
+        logger.info(f"Evicted conversation thread {thread_id}")
+        return entry
+
+    def _entry(self, thread_id: str, create: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            entry = self._threads.get(thread_id)
+            if entry is None:
+                if not create:
+                    return None
+                entry = _ThreadEntry(self._new_thread_saver(thread_id))
+                self._threads[thread_id] = entry
+            else:
+                self._threads.move_to_end(thread_id)
+            entry.last_access = now
+            return entry
+
+    def _account(self, thread_id: str, entry: _ThreadEntry):
+        with self._lock:
+            if self._threads.get(thread_id) is not entry:
+                return
+            _prune_saver(entry.saver)
+            size = _saver_size(entry.saver)
+            self._bytes += size - entry.nbytes
+            entry.nbytes = size
+            # Never evict the thread that is being written to
+            while len(self._threads) > 1 and (
+                    len(self._threads) > self.max_threads or self._bytes > self.max_bytes):
+                oldest = next(iter(self._threads))
+                if oldest == thread_id:
+                    break
+                self._evict(oldest)
+
+    def stats(self) -> dict:
+        """Return live thread count, bytes held and evictions so far."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "live_threads": len(self._threads),
+                "bytes_held": self._bytes,
+                "evictions": self.evictions,
+                "max_threads": self.max_threads,
+                "max_bytes": self.max_bytes,
+            }
+
+    # BaseCheckpointSaver interface
+
+    def get_tuple(self, config):
+        entry = self._entry(self._thread_id(config))
+        return entry.saver.get_tuple(config) if entry else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        if config is not None:
+            entry = self._entry(self._thread_id(config))
+            savers = [entry.saver] if entry else []
+        else:
+            with self._lock:
+                savers = [entry.saver for entry in self._threads.values()]
+        for saver in savers:
+            for checkpoint in saver.list(config, filter=filter, before=before, limit=limit):
+                yield checkpoint
+                if limit is not None:
+                    limit -= 1
+                    if limit <= 0:
+                        return
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = self._thread_id(config)
+        entry = self._entry(thread_id, create=True)
+        result = entry.saver.put(config, checkpoint, metadata, new_versions)
+        self._account(thread_id, entry)
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = self._thread_id(config)
+        entry = self._entry(thread_id, create=True)
+        entry.saver.put_writes(config, writes, task_id, task_path)
+        self._account(thread_id, entry)
+
+    def delete_thread(self, thread_id: str):
+        with self._lock:
+            entry = self._threads.pop(thread_id, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+
+    def get_next_version(self, current, channel=None):
+        return self._versions.get_next_version(current, channel)
+
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for checkpoint in self.list(config, filter=filter, before=before, limit=limit):
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str):
+        return self.delete_thread(thread_id)
+
+
+class SQLiteCheckpointSaver(BoundedMemorySaver):
+    """Durable checkpointer: bounded in-memory threads backed by SQLite.
+
+    Hot threads live in memory exactly as in BoundedMemorySaver. Writes
+    only mark a thread dirty; a background thread flushes dirty threads
+    every ``flush_interval`` seconds in one transaction, so a burst of
+    checkpoints for one turn becomes a single row write. Threads evicted
+    from memory stay on disk and are loaded again on first access.
+    Threads not updated for ``retention_seconds`` are deleted from disk,
+    and freed pages are returned with an incremental vacuum.
+
+    The database runs in WAL mode. At most ``flush_interval`` seconds of
+    history can be lost on a crash; close() flushes everything.
+    """
+
+    def __init__(self, path: str = "conversations.db", flush_interval: float = 1.0,
+                 retention_seconds: float = 30 * 24 * 3600,
+                 vacuum_interval: float = 3600.0, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.retention_seconds = retention_seconds
+        self.vacuum_interval = vacuum_interval
+        self.flushes = 0
+        self.rows_written = 0
+        self._dirty = set()
+        self._pending = {}
+        self._flushing = {}
+        self._db_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS threads ("
+            " thread_id TEXT PRIMARY KEY,"
+            " state BLOB NOT NULL,"
+            " updated_at REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at)")
+
+        self._writer = threading.Thread(
+            target=self._background, name="sqlite-checkpointer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # Serialization of one thread's MemorySaver
+
+    @staticmethod
+    def _dump(saver: MemorySaver) -> bytes:
+        state = {
+            "storage": {
+                thread_id: {ns: dict(checkpoints) for ns, checkpoints in namespaces.items()}
+                for thread_id, namespaces in saver.storage.items()
+            },
+            "writes": {key: dict(value) for key, value in saver.writes.items()},
+            "blobs": dict(getattr(saver, "blobs", {})),
+        }
+        return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(saver: MemorySaver, blob: bytes):
+        # Only ever reads rows this class wrote itself
+        state = pickle.loads(blob)
+        for thread_id, namespaces in state["storage"].items():
+            for ns, checkpoints in namespaces.items():
+                saver.storage[thread_id][ns].update(checkpoints)
+        for key, value in state["writes"].items():
+            saver.writes[key] = value
+        if hasattr(saver, "blobs"):
+            saver.blobs.update(state["blobs"])
+        # Rows written before pruning was added still hold every checkpoint
+        _prune_saver(saver)
+
+    def _new_thread_saver(self, thread_id: str) -> MemorySaver:
+        saver = super()._new_thread_saver(thread_id)
+        # Evicted threads may not have reached the database yet
+        blob = self._pending.get(thread_id) or self._flushing.get(thread_id)
+        if blob is None:
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT state FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+            blob = row[0] if row else None
+        if blob is not None:
+            self._load(saver, blob)
+            logger.info(f"Loaded conversation thread {thread_id} from {self.path}")
+        return saver
+
+    # Dirty tracking and write-back
+
+    def _account(self, thread_id: str, entry):
+        with self._lock:
+            if self._threads.get(thread_id) is entry:
+                self._dirty.add(thread_id)
+            super()._account(thread_id, entry)
+
+    def _evict(self, thread_id: str):
+        entry = super()._evict(thread_id)
+        if thread_id in self._dirty:
+            self._dirty.discard(thread_id)
+            self._pending[thread_id] = self._dump(entry.saver)
+        return entry
+
+    def flush(self):
+        """Write every dirty thread to disk in a single transaction."""
+        with self._lock:
+            for thread_id in self._dirty:
+                self._pending[thread_id] = self._dump(self._threads[thread_id].saver)
+            self._dirty.clear()
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+        if not batch:
+            return
+        now = time.time()
+        try:
+            with self._db_lock:
+                try:
+                    self._conn.execute("BEGIN")
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO threads (thread_id, state, updated_at)"
+                        " VALUES (?, ?, ?)",
+                        [(thread_id, blob, now) for thread_id, blob in batch.items()])
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    raise
+        except Exception:
+            with self._lock:
+                # Keep the batch for the next flush, unless newer state exists
+                for thread_id, blob in batch.items():
+                    self._pending.setdefault(thread_id, blob)
+            raise
+        finally:
+            with self._lock:
+                self._flushing = {}
+        self.flushes += 1
+        self.rows_written += len(batch)
+
+    def vacuum(self):
+        """Drop threads past retention and return freed pages to the OS."""
+        cutoff = time.time() - self.retention_seconds
+        with self._db_lock:
+            deleted = self._conn.execute(
+                "DELETE FROM threads WHERE updated_at < ?", (cutoff,)).rowcount
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if deleted:
+            logger.info(f"Removed {deleted} expired conversation thread(s) from {self.path}")
+
+    def _background(self):
+        last_vacuum = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if self.vacuum_interval and time.monotonic() - last_vacuum >= self.vacuum_interval:
+                    self.vacuum()
+                    last_vacuum = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error persisting conversations to {self.path}: {e}")
+
+    def delete_thread(self, thread_id: str):
+        with self._lock:
+            super().delete_thread(thread_id)
+            self._dirty.discard(thread_id)
+            self._pending.pop(thread_id, None)
+            self._flushing.pop(thread_id, None)
+        with self._db_lock:
+            self._conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._db_lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+        stats.update({
+            "stored_threads": stored,
+            "dirty_threads": len(self._dirty),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        })
+        return stats
+
+    def close(self):
+        """Stop the writer thread, flush pending state and close the DB."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+def build_checkpointer(backend: str = "memory", **options):
+    """Create a checkpointer for ``backend`` ("memory" or "sqlite")."""
+    if backend == "memory":
+        return BoundedMemorySaver(**options)
+    if backend == "sqlite":
+        return SQLiteCheckpointSaver(**options)
+    raise ValueError(f"Unknown memory backend: {backend}")
+
+
+# browser_mcp.json "memory" keys -> checkpointer arguments
+_CONFIG_KEYS = {
+    "path": "path",
+    "maxThreads": "max_threads",
+    "ttlSeconds": "ttl_seconds",
+    "maxBytes": "max_bytes",
+    "flushInterval": "flush_interval",
+    "retentionSeconds": "retention_seconds",
+    "vacuumInterval": "vacuum_interval",
+}
+
+
+def checkpointer_from_config(config: dict, backend: str = None):
+    """Create a checkpointer from the "memory" section of browser_mcp.json."""
+    backend = backend or config.get("backend", "memory")
+    options = {arg: config[key] for key, arg in _CONFIG_KEYS.items() if key in config}
+    if backend == "memory":
+        for key in ("path", "flush_interval", "retention_seconds", "vacuum_interval"):
+            options.pop(key, None)
+    return build_checkpointer(backend, **options)
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def _content_text(message) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part if isinstance(part, str) else str(part.get("text", ""))
+        for part in content
+    )
+
+
+def message_tokens(message) -> int:
+    """Estimated prompt tokens for one message, including tool call args."""
+    tokens = estimate_tokens(_content_text(message)) + 4
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(call["name"] + json.dumps(call.get("args", {})))
+    return tokens
+
+
+class HistoryCompactor:
+    """Shrinks the conversation before every model call.
+
+    Used as the ReAct graph's ``pre_model_hook``: the checkpointed history
+    is left untouched and only the messages sent to the model are
+    compacted.
+
+    - the last ``keep_last_turns`` turns (a human message and everything
+      after it) are kept verbatim
+    - tool outputs in older turns are cut to ``tool_output_chars``
+    - if the result is still over ``max_tokens``, the oldest turns are
+      dropped whole, so tool calls and their results stay paired
+    - if the recent turns alone are over, their tool outputs are cut too
+      (oldest turn first), then the recent window shrinks down to the
+      current turn
+    """
+
+    def __init__(self, max_tokens: int = 6000, keep_last_turns: int = 2,
+                 tool_output_chars: int = 600, token_counter=message_tokens):
+        self.max_tokens = max_tokens
+        self.keep_last_turns = keep_last_turns
+        self.tool_output_chars = tool_output_chars
+        self.token_counter = token_counter
+        self.tokens_saved_total = 0
+        self._lock = threading.Lock()
+        self._turn_savings = defaultdict(int)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Create a compactor from the "compaction" section of browser_mcp.json."""
+        if not config.get("enabled", True):
+            return None
+        return cls(
+            max_tokens=config.get("maxTokens", 6000),
+            keep_last_turns=config.get("keepLastTurns", 2),
+            tool_output_chars=config.get("toolOutputChars", 600),
+        )
+
+    def _count(self, messages) -> int:
+        return sum(self.token_counter(message) for message in messages)
+
+    def _truncate_tool_output(self, message):
+        text = _content_text(message)
+        if len(text) <= self.tool_output_chars:
+            return message
+        omitted = len(text) - self.tool_output_chars
+        return message.model_copy(update={
+            "content": f"{text[:self.tool_output_chars]}... [{omitted} characters omitted]"
+        })
+
+    def _fit_recent(self, system: list, recent: list):
+        """Shrink the recent turns until they fit in ``max_tokens`` on their
+        own; returns the turns and how many were dropped."""
+        def total():
+            return self._count(system) + sum(self._count(turn) for turn in recent)
+
+        recent = list(recent)
+        for i, turn in enumerate(recent):
+            if total() <= self.max_tokens:
+                return recent, 0
+            recent[i] = [
+                self._truncate_tool_output(m) if isinstance(m, ToolMessage) else m for m in turn
+            ]
+        dropped = 0
+        while len(recent) > 1 and total() > self.max_tokens:
+            recent.pop(0)
+            dropped += 1
+        if total() > self.max_tokens:
+            logger.warning(f"Current turn alone is ~{total()} tokens, over the "
+                           f"{self.max_tokens} token history budget")
+        return recent, dropped
+
+    def compact(self, messages: list) -> list:
+        """Return a compacted copy of ``messages``."""
+        system = [m for m in messages[:1] if isinstance(m, SystemMessage)]
+        body = messages[len(system):]
+
+        starts = [i for i, m in enumerate(body) if isinstance(m, HumanMessage)]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        turns = [body[start:end] for start, end in zip(starts, starts[1:] + [len(body)])]
+
+        keep = max(1, self.keep_last_turns)
+        old, recent = turns[:-keep], turns[-keep:]
+        old = [
+            [self._truncate_tool_output(m) if isinstance(m, ToolMessage) else m for m in turn]
+            for turn in old
+        ]
+
+        recent, dropped_recent = self._fit_recent(system, recent)
+        recent_tokens = self._count(system) + sum(self._count(turn) for turn in recent)
+        budget = self.max_tokens - recent_tokens
+        kept_old = []
+        for turn in reversed(old):
+            tokens = self._count(turn)
+            if tokens > budget:
+                break
+            kept_old.insert(0, turn)
+            budget -= tokens
+
+        dropped = len(old) - len(kept_old) + dropped_recent
+        notice = []
+        if dropped:
+            notice = [SystemMessage(
+                content=f"[{dropped} earlier conversation turn(s) omitted to save context]")]
+        return system + notice + [m for turn in kept_old + recent for m in turn]
+
+    def __call__(self, state, config):
+        messages = state["messages"]
+        compacted = self.compact(messages)
+        saved = self._count(messages) - self._count(compacted)
+        if saved > 0:
+            thread_id = config.get("configurable", {}).get("thread_id", "default")
+            with self._lock:
+                self.tokens_saved_total += saved
+                self._turn_savings[thread_id] += saved
+            logger.info(f"Compacted history for thread {thread_id}: saved ~{saved} tokens")
+        return {"llm_input_messages": compacted}
+
+    def pop_turn_savings(self, thread_id: str) -> int:
+        """Return and reset the tokens saved for a thread since the last call."""
+        with self._lock:
+            return self._turn_savings.pop(thread_id, 0)
@@ -1,13 +1,291 @@
 from fastmcp import FastMCP
 from duckduckgo_search import DDGS
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from urllib.parse import urlsplit
 
-mcp = FastMCP("duckduckgo-search")
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", 4))
+CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 512))
+# Set to a JSON file path to keep cached results across restarts
+CACHE_PATH = os.getenv("SEARCH_CACHE_PATH")
+MAX_QUERIES = int(os.getenv("SEARCH_MAX_QUERIES", 8))
+MAX_PER_QUERY = 10
+# Word-set overlap above which two snippets count as the same result
+SNIPPET_SIMILARITY = 0.8
+# Default size limits for formatted results
+SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", 200))
+RESULT_TOKENS = int(os.getenv("SEARCH_RESULT_TOKENS", 400))
+URL_SNIPPET_CHARS = 80
 
 
-@mcp.tool()
-async def search_web(query: str) -> str:
+def ddgs_search(query: str, max_results: int) -> list:
     with DDGS() as ddgs:
-        results = [r for r in ddgs.text(query, max_results=3)]
-        return "\n".join([f"{r['title']}: {r['body']}" for r in results])
+        return list(ddgs.text(query, max_results=max_results))
+
+
+# Blocking callable (query, max_results) -> list of {"title", "href", "body"}
+# dicts; tests replace it with a stub
+search_backend = ddgs_search
+
+
+def set_search_backend(backend):
+    """Swap the search backend (e.g. a stub in tests) and drop cached results"""
+    global search_backend
+    search_backend = backend
+    cache.entries.clear()
+
+
+class SearchCache:
+    """LRU cache of search results with a time-to-live per entry"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored_at, results)
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stored_at, results = entry
+        if time.time() - stored_at > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return results
+
+    def put(self, key: str, results: list):
+        self.entries[key] = (time.time(), results)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        now = time.time()
+        for key, stored_at, results in stored:
+            if now - stored_at <= self.ttl:
+                self.entries[key] = (stored_at, results)
+
+    def save(self, path: str):
+        stored = [[key, stored_at, results] for key, (stored_at, results) in self.entries.items()]
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp, path)
+
+
+cache = SearchCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+stats = {"hits": 0, "misses": 0, "errors": 0}
+latencies = deque(maxlen=200)  # seconds per backend search
+
+# DDGS is blocking: run it on worker threads, never on the event loop
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="ddgs")
+search_slots = asyncio.Semaphore(SEARCH_WORKERS)
+# Identical queries that arrive together share one backend search
+in_flight = {}
+
+
+@asynccontextmanager
+async def lifespan(server):
+    if CACHE_PATH:
+        cache.load(CACHE_PATH)
+    try:
+        yield
+    finally:
+        if CACHE_PATH:
+            cache.save(CACHE_PATH)
+        search_executor.shutdown(wait=False, cancel_futures=True)
+
+
+mcp = FastMCP("duckduckgo-search", lifespan=lifespan)
+
+
+def cache_key(query: str, max_results: int) -> str:
+    return f"{max_results}:{' '.join(query.lower().split())}"
+
+
+async def run_search(query: str, max_results: int) -> list:
+    async with search_slots:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(
+                search_executor, search_backend, query, max_results)
+        except Exception:
+            stats["errors"] += 1
+            raise
+        latencies.append(time.perf_counter() - start)
+        return results
+
+
+async def cached_search(query: str, max_results: int) -> list:
+    """Search results for a query, served from the cache when possible"""
+    key = cache_key(query, max_results)
+    results = cache.get(key)
+    if results is not None:
+        stats["hits"] += 1
+        return results
+
+    stats["misses"] += 1
+    task = in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(run_search(query, max_results))
+        in_flight[key] = task
+        task.add_done_callback(lambda _: in_flight.pop(key, None))
+    results = await asyncio.shield(task)
+    cache.put(key, results)
+    return results
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def clip(text: str, limit: int) -> str:
+    """Cut text to at most ``limit`` characters, on a word boundary"""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(",.;:") + "..."
+
+
+def _format_results(results: list, labels: list = None, snippet_chars: int = SNIPPET_CHARS,
+                    max_tokens: int = RESULT_TOKENS, urls_only: bool = False) -> str:
+    """Render search results as compact lines within a token budget.
+
+    Results are added in order until the next line would exceed
+    ``max_tokens``; a footer reports how many were shown and the size of
+    the output. With ``urls_only`` each line is a title, URL and a short
+    snippet, so the agent can fetch a page only when it needs the detail.
+    """
+    if urls_only:
+        snippet_chars = min(snippet_chars, URL_SNIPPET_CHARS)
+    lines = []
+    used = 0
+    for i, r in enumerate(results):
+        label = labels[i] if labels else ""
+        snippet = clip(r.get("body", ""), snippet_chars)
+        if urls_only:
+            line = f"{label}{r.get('title', '')} <{r.get('href', '')}> {snippet}"
+        else:
+            line = f"{label}{r.get('title', '')}: {snippet} ({r.get('href', '')})"
+        tokens = estimate_tokens(line) + 1
+        if lines and used + tokens > max_tokens:
+            break
+        if not lines and tokens > max_tokens:
+            line = clip(line, max(1, (max_tokens - 1) * 4))
+            tokens = estimate_tokens(line) + 1
+        lines.append(line)
+        used += tokens
+    lines.append(f"[{len(lines)} of {len(results)} results, {sum(len(line) for line in lines)} chars, ~{used} tokens]")
+    return "\n".join(lines)
+
+
+@mcp.tool()
+async def search_web(query: str, max_results: int = 3, snippet_chars: int = SNIPPET_CHARS,
+                     max_tokens: int = RESULT_TOKENS, urls_only: bool = False) -> str:
+    """Search the web. Snippets are cut to snippet_chars and the whole answer
+    to about max_tokens; set urls_only for titles, URLs and short snippets"""
+    max_results = max(1, min(max_results, MAX_PER_QUERY))
+    results = await cached_search(query, max_results)
+    return _format_results(results, snippet_chars=snippet_chars,
+                           max_tokens=max_tokens, urls_only=urls_only)
+
+
+def url_key(href: str) -> str:
+    """Normalize a URL so http/https, www. and trailing slashes compare equal"""
+    parts = urlsplit(href.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    return f"{host}{parts.path.rstrip('/')}?{parts.query}"
+
+
+def snippet_words(body: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", body.lower()))
+
+
+def is_near_duplicate(words: set, other: set) -> bool:
+    if not words or not other:
+        return False
+    return len(words & other) / len(words | other) >= SNIPPET_SIMILARITY
+
+
+def merge_results(result_lists: list) -> list:
+    """Merge per-query results, folding duplicate URLs and near-identical
+    snippets into one entry, ranked by how many queries returned it"""
+    merged = []
+    by_url = {}
+    for query_index, results in enumerate(result_lists):
+        for rank, r in enumerate(results):
+            key = url_key(r["href"]) if r.get("href") else None
+            words = snippet_words(r.get("body", ""))
+            entry = by_url.get(key) if key else None
+            if entry is None:
+                entry = next((e for e in merged if is_near_duplicate(words, e["words"])), None)
+            if entry is None:
+                entry = {**r, "words": words, "queries": set(), "best_rank": rank}
+                merged.append(entry)
+            if key:
+                by_url[key] = entry
+            entry["queries"].add(query_index)
+            entry["best_rank"] = min(entry["best_rank"], rank)
+    merged.sort(key=lambda e: (-len(e["queries"]), e["best_rank"]))
+    return merged
+
+
+@mcp.tool()
+async def search_many(queries: list[str], per_query: int = 3, snippet_chars: int = SNIPPET_CHARS,
+                      max_tokens: int = RESULT_TOKENS, urls_only: bool = False) -> str:
+    """Run several web searches at once and return one merged list of results,
+    with duplicates removed and results found by more queries listed first.
+    snippet_chars, max_tokens and urls_only work as in search_web"""
+    queries = list(dict.fromkeys(q.strip() for q in queries if q.strip()))[:MAX_QUERIES]
+    if not queries:
+        return "No queries given"
+    per_query = max(1, min(per_query, MAX_PER_QUERY))
+
+    outcomes = await asyncio.gather(
+        *(cached_search(q, per_query) for q in queries), return_exceptions=True)
+    failed = [q for q, outcome in zip(queries, outcomes) if isinstance(outcome, Exception)]
+    result_lists = [[] if isinstance(outcome, Exception) else outcome for outcome in outcomes]
+    merged = merge_results(result_lists)
+
+    labels = [f"[{len(entry['queries'])}/{len(queries)}] " for entry in merged]
+    output = _format_results(merged, labels, snippet_chars=snippet_chars,
+                             max_tokens=max_tokens, urls_only=urls_only)
+    if failed:
+        output += f"\nFailed queries: {', '.join(failed)}"
+    return output
+
+
+@mcp.resource("stats://search")
+def search_stats() -> str:
+    """Search cache hit rate and backend latency (a resource, so it stays out
+    of the LLM's tool list)"""
+    lookups = stats["hits"] + stats["misses"]
+    ordered = sorted(latencies)
+    return json.dumps({
+        **stats,
+        "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+        "cached_queries": len(cache.entries),
+        "latency_avg_ms": 1000 * sum(ordered) / len(ordered) if ordered else None,
+        # Nearest-rank percentile
+        "latency_p95_ms": 1000 * ordered[math.ceil(len(ordered) * 0.95) - 1] if ordered else None,
+    })
+
+
 if __name__ == "__main__":
     mcp.run(transport="stdio")
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+# Written by imagegenerator_mcp: one JSON line per created, reused or evicted image
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class ImageIndex:
+    """In-memory index of generated images, kept current from the manifest.
+
+    The image server appends an event to ``generated_images/manifest.jsonl``
+    whenever it creates, reuses or evicts an image. Each lookup reads only
+    the bytes appended since the previous one, so "latest N" no longer globs
+    and stats the whole directory.
+    """
+
+    def __init__(self, images_dir: str = "generated_images"):
+        self.images_dir = images_dir
+        self.manifest_path = os.path.join(images_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._images = OrderedDict()  # filename -> timestamp, oldest first
+        self._offset = 0
+        self._inode = None
+        self._loaded = False
+
+    def _scan_directory(self):
+        """One-off scan for images that predate the manifest."""
+        if not os.path.isdir(self.images_dir):
+            return
+        found = []
+        with os.scandir(self.images_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    found.append((entry.stat().st_mtime, entry.name))
+        for mtime, name in sorted(found):
+            self._images[name] = mtime
+
+    def _apply(self, event: dict):
+        filename = event.get("filename")
+        if not filename:
+            return
+        if event.get("event") == "evicted":
+            self._images.pop(filename, None)
+            return
+        self._images.pop(filename, None)
+        self._images[filename] = event.get("time", 0.0)
+
+    def _refresh(self):
+        if not self._loaded:
+            self._scan_directory()
+            self._loaded = True
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return
+        if self._inode is None:
+            self._inode = stat.st_ino
+        elif stat.st_ino != self._inode or stat.st_size < self._offset:
+            # Manifest was rotated: it now lists every live image, start over
+            self._inode = stat.st_ino
+            self._offset = 0
+            self._images.clear()
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.manifest_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(stat.st_size - self._offset)
+        # Ignore a trailing partial line; it is picked up next time
+        complete = data[:data.rfind(b"\n") + 1]
+        self._offset += len(complete)
+        for line in complete.splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, AttributeError):
+                logger.warning(f"Skipping bad manifest line: {line[:80]!r}")
+
+    def latest(self, limit: int = None) -> list:
+        """Filenames of the most recent images, newest first."""
+        with self._lock:
+            self._refresh()
+            names = reversed(self._images)
+            if limit is None:
+                return list(names)
+            return [name for _, name in zip(range(limit), names)]
@@ -1,42 +1,381 @@
 from fastmcp import FastMCP
-import requests
-import base64
-from io import BytesIO
+from mcp.types import ResourceLink, TextContent
+from contextlib import asynccontextmanager
+from pathlib import Path
+from urllib.parse import quote, urlencode
+from concurrent.futures import ProcessPoolExecutor
+import httpx
+import asyncio
 from PIL import Image
+import hashlib
+import json
+import multiprocessing
 import os
+import random
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-mcp = FastMCP("imagegenerator")
+IMAGES_DIR = "generated_images"
+IMAGE_MODEL = os.getenv("POLLINATIONS_MODEL", "flux")
+# Point at a local stub server to test without calling Pollinations
+POLLINATIONS_URL = os.getenv("POLLINATIONS_BASE_URL", "https://image.pollinations.ai")
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("IMAGE_MAX_CONCURRENT_DOWNLOADS", 4))
+MAX_RETRIES = int(os.getenv("IMAGE_MAX_RETRIES", 3))
+REQUEST_TIMEOUT = float(os.getenv("IMAGE_REQUEST_TIMEOUT", 30))
+THUMBS_DIR = os.path.join(IMAGES_DIR, "thumbs")
+# Event log read incrementally by the web app's ImageIndex
+MANIFEST_PATH = os.path.join(IMAGES_DIR, "manifest.jsonl")
+MANIFEST_MAX_BYTES = 1024 * 1024
+THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", 256))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+# Batch generation: images fetched at once per call, and prompts per call
+BATCH_CONCURRENCY = int(os.getenv("IMAGE_BATCH_CONCURRENCY", 4))
+MAX_BATCH_SIZE = int(os.getenv("IMAGE_MAX_BATCH_SIZE", 8))
+# Formats stored as downloaded, without decoding or re-encoding
+SERVED_FORMATS = {"png": ".png", "jpeg": ".jpg", "gif": ".gif"}
+MIME_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".gif": "image/gif"}
+# Total size of generated_images/ before least recently used images are evicted
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# Shared keep-alive HTTP client; created lazily on the server's event loop
+http_client = None
+download_slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+# Decoding, conversion and thumbnailing run off the event loop
+image_workers = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(max_connections=MAX_CONCURRENT_DOWNLOADS * 2,
+                                max_keepalive_connections=MAX_CONCURRENT_DOWNLOADS),
+            follow_redirects=True,
+        )
+    return http_client
+
+
+@asynccontextmanager
+async def lifespan(server):
+    try:
+        yield
+    finally:
+        if http_client is not None:
+            await http_client.aclose()
+        if image_workers is not None:
+            image_workers.shutdown(cancel_futures=True)
+
+
+mcp = FastMCP("imagegenerator", lifespan=lifespan)
+
+
+def image_url(prompt: str, width: int, height: int) -> str:
+    """Pollinations URL for a prompt, with the prompt fully percent-encoded"""
+    query = urlencode({"width": width, "height": height, "model": IMAGE_MODEL})
+    return f"{POLLINATIONS_URL}/prompt/{quote(prompt, safe='')}?{query}"
+
+
+class DownloadError(Exception):
+    """The image service did not return a usable image"""
+
+
+class RetryableStatus(Exception):
+    pass
+
+
+async def download_image(url: str, dest: str) -> bytes:
+    """Stream an image to ``dest`` and return its first bytes for sniffing.
+
+    5xx responses and timeouts are retried with jittered backoff.
+    """
+    async with download_slots:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with get_http_client().stream("GET", url) as response:
+                    if response.status_code >= 500 and attempt < MAX_RETRIES:
+                        raise RetryableStatus()
+                    if response.status_code != 200:
+                        raise DownloadError(
+                            f"Failed to generate image. Status code: {response.status_code}")
+                    header = b""
+                    with open(dest, "wb") as f:
+                        async for chunk in response.aiter_bytes():
+                            if len(header) < 16:
+                                header += chunk[:16 - len(header)]
+                            f.write(chunk)
+                    return header
+            except RetryableStatus:
+                pass
+            except (httpx.TimeoutException, httpx.TransportError):
+                if attempt == MAX_RETRIES:
+                    raise
+            # Full jitter: sleep a random time up to the exponential backoff
+            await asyncio.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+
+
+def image_digest(prompt: str, width: int, height: int, model: str = IMAGE_MODEL) -> str:
+    """Stable content key for a generation request"""
+    key = f"{model}\n{width}x{height}\n{prompt}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def image_basename(digest: str) -> str:
+    return f"image_{digest[:16]}"
+
+
+def thumbnail_path(image_path: str) -> str:
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(THUMBS_DIR, f"{stem}.jpg")
+
+
+def find_cached_image(digest: str):
+    """Return the stored image for a digest, whatever its format"""
+    base = os.path.join(IMAGES_DIR, image_basename(digest))
+    for ext in SERVED_FORMATS.values():
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+
+def sniff_format(header: bytes):
+    """Identify an image format from its magic bytes"""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def convert_to_png(src: str, dest: str):
+    """Re-encode an image as PNG (runs in the worker process pool)"""
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    with Image.open(src) as image:
+        image.save(tmp, format="PNG")
+    os.replace(tmp, dest)
+
+
+def make_thumbnail(src: str, dest: str, max_size: int):
+    """Write a JPEG preview of an image (runs in the worker process pool)"""
+    with Image.open(src) as image:
+        image.thumbnail((max_size, max_size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        image.save(tmp, format="JPEG", quality=80, optimize=True)
+    os.replace(tmp, dest)
+
+
+def get_image_workers() -> ProcessPoolExecutor:
+    global image_workers
+    if image_workers is None:
+        # Not fork: the stdio transport's reader thread holds the stdin lock,
+        # and a forked worker deadlocks closing its copy of stdin
+        image_workers = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return image_workers
+
+
+async def run_in_worker(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_workers(), func, *args)
+
+
+def image_files():
+    """(mtime, size, path) for every stored image, excluding thumbnails"""
+    entries = []
+    with os.scandir(IMAGES_DIR) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(tuple(SERVED_FORMATS.values())):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def record_image_event(path: str, event: str):
+    """Append a created/reused/evicted event to the image manifest"""
+    line = json.dumps({"event": event, "filename": os.path.basename(path),
+                       "time": time.time()}) + "\n"
+    with open(MANIFEST_PATH, "a", encoding="utf-8") as f:
+        f.write(line)
+        size = f.tell()
+    if size > MANIFEST_MAX_BYTES:
+        rotate_manifest()
+
+
+def rotate_manifest():
+    """Rewrite the manifest as one "created" event per live image"""
+    lines = [
+        json.dumps({"event": "created", "filename": os.path.basename(path), "time": mtime})
+        for mtime, _, path in sorted(image_files())
+    ]
+    tmp = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n" if lines else "")
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def evict_cache(keep: str = None):
+    """Delete least recently used images until the directory fits the cap"""
+    entries = image_files()
+    total = sum(size for _, size, _ in entries)
+
+    # mtime is refreshed on every cache hit, so oldest mtime = least recently used
+    entries.sort()
+    for _, size, path in entries:
+        if total <= CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        for stale in (path, thumbnail_path(path)):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+        total -= size
+        cache_stats["evictions"] += 1
+        record_image_event(path, "evicted")
+
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def image_link(image: dict) -> ResourceLink:
+    """Structured artifact describing a stored image"""
+    return ResourceLink(
+        type="resource_link",
+        name=os.path.basename(image["path"]),
+        uri=Path(image["path"]).resolve().as_uri(),
+        mimeType=image["mime_type"],
+        size=image["size"],
+        _meta={
+            "path": image["path"],
+            "thumbnail": image["thumbnail"],
+            "digest": image["digest"],
+            "prompt": image["prompt"],
+        },
+    )
+
+
+async def store_image(prompt: str, width: int, height: int) -> dict:
+    """Return the stored image's path, thumbnail, size and content digest,
+    downloading it on a cache miss"""
+    digest = image_digest(prompt, width, height)
+    filename = find_cached_image(digest)
+
+    if filename is not None:
+        os.utime(filename)
+        cache_stats["hits"] += 1
+        record_image_event(filename, "reused")
+    else:
+        cache_stats["misses"] += 1
+        os.makedirs(IMAGES_DIR, exist_ok=True)
+
+        # Stream to a temporary name so readers never see a partial file
+        base = os.path.join(IMAGES_DIR, image_basename(digest))
+        tmp_filename = f"{base}.{os.getpid()}.{random.getrandbits(32):08x}.tmp"
+        try:
+            header = await download_image(image_url(prompt, width, height), tmp_filename)
+            fmt = sniff_format(header)
+            if fmt in SERVED_FORMATS:
+                # Already a format browsers display: keep the original bytes
+                filename = base + SERVED_FORMATS[fmt]
+                os.replace(tmp_filename, filename)
+            else:
+                filename = base + ".png"
+                try:
+                    await run_in_worker(convert_to_png, tmp_filename, filename)
+                except Exception:
+                    raise DownloadError("Response was not a valid image")
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+        record_image_event(filename, "created")
+        evict_cache(keep=filename)
+
+    thumbnail = thumbnail_path(filename)
+    if not os.path.exists(thumbnail):
+        os.makedirs(THUMBS_DIR, exist_ok=True)
+        await run_in_worker(make_thumbnail, filename, thumbnail, THUMBNAIL_SIZE)
+    return {
+        "path": filename,
+        "thumbnail": thumbnail,
+        "size": os.path.getsize(filename),
+        "digest": await asyncio.to_thread(file_sha256, filename),
+        "mime_type": MIME_TYPES[os.path.splitext(filename)[1]],
+        "prompt": prompt,
+    }
 
 
 @mcp.tool()
-async def generate_image(prompt: str, width: int = 512, height: int = 512) -> str:
+async def generate_image(prompt: str, width: int = 512,
+                         height: int = 512) -> list[TextContent | ResourceLink]:
     """Generate an image using a free API service"""
     try:
-        # Using Pollinations AI (free image generation API)
-        url = f"https://image.pollinations.ai/prompt/{prompt.replace(' ', '%20')}?width={width}&height={height}"
+        image = await store_image(prompt, width, height)
+        summary = (f"Image generated successfully and saved as: {image['path']}\n"
+                   f"Prompt: {prompt}")
+        return [TextContent(type="text", text=summary), image_link(image)]
 
-        response = requests.get(url, timeout=30)
+    except DownloadError as e:
+        return str(e)
+    except Exception as e:
+        return f"Error generating image: {str(e)}"
 
-        if response.status_code == 200:
-            # Save image temporarily and return path or base64
-            image = Image.open(BytesIO(response.content))
 
-            # Create images directory if it doesn't exist
-            os.makedirs("generated_images", exist_ok=True)
+@mcp.tool()
+async def generate_images(prompts: list[str], width: int = 512,
+                          height: int = 512) -> list[TextContent | ResourceLink]:
+    """Generate one image per prompt in parallel (e.g. one per story scene) and report each result"""
+    if not prompts:
+        return "No prompts provided"
+    if len(prompts) > MAX_BATCH_SIZE:
+        return f"Too many prompts: at most {MAX_BATCH_SIZE} images per call"
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
 
-            # Save image
-            filename = f"generated_images/image_{hash(prompt) % 10000}.png"
-            image.save(filename)
+    async def generate_one(prompt):
+        async with slots:
+            return await store_image(prompt, width, height)
 
-            return f"Image generated successfully and saved as: {filename}\nPrompt: {prompt}"
+    # Identical prompts share one download
+    unique = list(dict.fromkeys(prompts))
+    outcomes = await asyncio.gather(
+        *(generate_one(prompt) for prompt in unique), return_exceptions=True)
+    results = dict(zip(unique, outcomes))
+
+    lines = []
+    links = []
+    for number, prompt in enumerate(prompts, 1):
+        result = results[prompt]
+        if isinstance(result, Exception):
+            lines.append(f"{number}. Failed: {result}\n   Prompt: {prompt}")
         else:
-            return f"Failed to generate image. Status code: {response.status_code}"
+            lines.append(f"{number}. Image saved as: {result['path']}\n   Prompt: {prompt}")
+            links.append(image_link(result))
 
-    except Exception as e:
-        return f"Error generating image: {str(e)}"
+    summary = f"Generated {len(links)} of {len(prompts)} images\n" + "\n".join(lines)
+    return [TextContent(type="text", text=summary), *links]
+
+
+@mcp.resource("stats://image-cache")
+def image_cache_stats() -> str:
+    """Image cache hits, misses and evictions (a resource, not a tool, so it
+    stays out of the LLM's tool list)"""
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    hit_rate = cache_stats["hits"] / lookups if lookups else 0.0
+    return (f"Image cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({hit_rate:.0%} hit rate), {cache_stats['evictions']} evictions")
 
 
 @mcp.tool()
@@ -0,0 +1,229 @@
+from abc import ABC, abstractmethod
+from langchain_core.messages import AIMessage
+from dataclasses import dataclass
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+GENRES = ("fantasy", "horror", "mystery", "romance", "comedy", "adventure",
+          "thriller", "science fiction", "sci-fi", "fairy tale", "drama")
+LENGTHS = {"short": "short", "brief": "short", "quick": "short",
+           "long": "long", "detailed": "long", "epic": "long"}
+INSPIRATION_CHARS = 400
+
+# The MCP servers report failures as text rather than raising
+ERROR_PREFIXES = ("Error", "Failed")
+
+
+@dataclass
+class RouteStats:
+    """LLM calls and time a fast-path run used, and what it saved against
+    the ReAct loop (estimated)."""
+    intent: str
+    llm_calls: int
+    llm_calls_saved: int
+    seconds: float
+    seconds_saved: float
+
+
+@dataclass
+class FastPathResult:
+    text: str
+    messages: list  # tool call, tool result and answer messages for memory
+    stats: RouteStats
+
+
+async def call_tool(tool, args: dict):
+    """Invoke a tool the way ToolNode does; returns (call, ToolMessage, seconds)."""
+    call = {"name": tool.name, "args": args,
+            "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+    start = time.perf_counter()
+    message = await tool.ainvoke(call)
+    if tool_failed(message):
+        raise RuntimeError(f"{tool.name} failed: {str(message.content)[:200]}")
+    return call, message, time.perf_counter() - start
+
+
+def tool_failed(message) -> bool:
+    """Whether a ToolMessage reports an error, an error string from the
+    server or a call cut off by its timeout."""
+    if getattr(message, "status", None) == "error":
+        return True
+    content = message.content
+    if not isinstance(content, str):
+        return False
+    if content.lstrip().startswith(ERROR_PREFIXES):
+        return True
+    if content.startswith("{"):
+        try:
+            return json.loads(content).get("status") == "timeout"
+        except (ValueError, AttributeError):
+            return False
+    return False
+
+
+class Intent(ABC):
+    """A request shape that can be served by a fixed plan instead of ReAct.
+
+    Subclasses set ``name`` and ``tools`` (the tools the plan needs) and
+    implement ``match`` and ``run``.
+    """
+    name = "intent"
+    tools = ()
+
+    @abstractmethod
+    def match(self, text: str):
+        """Parameters for the plan, or None if ``text`` is not this intent."""
+
+    @abstractmethod
+    async def run(self, params: dict, tools: dict, llm, user_input: str) -> FastPathResult:
+        """Carry out the plan with ``tools`` (name -> tool)."""
+
+
+class StoryWithImageIntent(Intent):
+    """"Write a story about X and generate an image".
+
+    Runs web search, then write_story and generate_image in parallel, then
+    a single LLM call that titles and introduces the result. ReAct spends
+    one LLM round-trip per tool plus one for the answer on the same request.
+    """
+    name = "story_with_image"
+    tools = ("write_story", "generate_image")
+
+    pattern = re.compile(
+        r"\b(?:story|tale|fable)\b.*?\babout\s+(?P<topic>.+?)\s*"
+        r"(?:,|\.|\band\b|\bthen\b|\bplus\b)\s*(?:also\s+|please\s+)?"
+        r"(?:generate|create|make|draw|add|include|produce)\b.*?"
+        r"\b(?:image|picture|illustration|drawing|artwork)s?\b",
+        re.IGNORECASE | re.DOTALL)
+
+    def __init__(self, search: bool = True):
+        self.search = search
+
+    def match(self, text: str):
+        found = self.pattern.search(text)
+        if found is None:
+            return None
+        topic = found.group("topic").strip(" \t\n.,!?\"'")
+        if not topic or len(topic) > 200:
+            return None
+        lowered = text.lower()
+        genre = next((g for g in GENRES if re.search(rf"\b{g}\b", lowered)), "general")
+        length = next((v for k, v in LENGTHS.items() if re.search(rf"\b{k}\b", lowered)), "medium")
+        return {"topic": topic, "genre": genre, "length": length}
+
+    async def run(self, params: dict, tools: dict, llm, user_input: str) -> FastPathResult:
+        start = time.perf_counter()
+        topic = params["topic"]
+        rounds = []
+
+        story_topic = topic
+        if self.search and "search_web" in tools:
+            search = await call_tool(tools["search_web"], {
+                "query": topic, "max_results": 3, "max_tokens": 150, "urls_only": True})
+            rounds.append([search])
+            # Titles and snippets only; the footer and URLs are no use to the story
+            lines = search[1].content.splitlines()[:-1]
+            inspiration = " ".join(re.sub(r"<[^>]*>", "", line).strip() for line in lines)
+            if inspiration:
+                story_topic = f"{topic} (background for inspiration: {inspiration[:INSPIRATION_CHARS]})"
+
+        story, image = await asyncio.gather(
+            call_tool(tools["write_story"], {
+                "topic": story_topic, "genre": params["genre"], "length": params["length"]}),
+            call_tool(tools["generate_image"], {
+                "prompt": f"{topic}, illustration for a {params['genre']} story"}),
+        )
+        rounds.append([story, image])
+        story_text, image_text = story[1].content, image[1].content
+
+        llm_start = time.perf_counter()
+        response = await llm.ainvoke(f"""The user asked: {user_input}
+
+A story was written and an image was generated for it.
+
+Image result: {image_text}
+
+Story opening:
+{story_text[:600]}
+
+Reply with a title for the story on the first line, then one or two sentences introducing the story and the image. Do not repeat the story.""")
+        llm_seconds = time.perf_counter() - llm_start
+        text = f"{response.content.strip()}\n\n{story_text}\n\n{image_text}"
+
+        messages = []
+        for calls in rounds:
+            messages.append(AIMessage(content="", tool_calls=[call for call, _, _ in calls]))
+            messages.extend(message for _, message, _ in calls)
+        messages.append(AIMessage(content=text))
+
+        # ReAct would make one LLM call per tool (llama3 calls them one at a
+        # time) plus the answer, and run the tools back to back
+        tool_calls = [result for calls in rounds for result in calls]
+        sequential = sum(seconds for _, _, seconds in tool_calls)
+        parallel = sum(max(seconds for _, _, seconds in calls) for calls in rounds)
+        stats = RouteStats(
+            intent=self.name,
+            llm_calls=1,
+            llm_calls_saved=len(tool_calls),
+            seconds=time.perf_counter() - start,
+            seconds_saved=len(tool_calls) * llm_seconds + sequential - parallel,
+        )
+        return FastPathResult(text, messages, stats)
+
+
+class IntentRouter:
+    """Serves recognized requests with a fixed plan ahead of the ReAct agent.
+
+    Intents are tried in order; the first whose tools are available and
+    whose ``match`` accepts the request runs. Anything else, and any plan
+    that fails or gets a failed tool result, falls through to ReAct.
+    """
+
+    def __init__(self, intents: list = None):
+        self.intents = list(intents) if intents is not None else [StoryWithImageIntent()]
+        self.stats = {"routed": 0, "fallbacks": 0, "llm_calls_saved": 0, "seconds_saved": 0.0}
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Create a router from the "intentRouter" section of browser_mcp.json."""
+        if not config.get("enabled", True):
+            return None
+        return cls([StoryWithImageIntent(search=config.get("search", True))])
+
+    def register(self, intent: Intent):
+        self.intents.append(intent)
+
+    def match(self, text: str, tools: dict):
+        for intent in self.intents:
+            if all(name in tools for name in intent.tools):
+                params = intent.match(text)
+                if params is not None:
+                    return intent, params
+        return None
+
+    async def run(self, text: str, tools: dict, llm):
+        """Run the matching plan, or return None to fall through to ReAct."""
+        matched = self.match(text, tools)
+        if matched is None:
+            return None
+        intent, params = matched
+        try:
+            result = await intent.run(params, tools, llm, text)
+        except Exception as e:
+            self.stats["fallbacks"] += 1
+            logger.warning(f"Fast path {intent.name} failed, falling back to ReAct: {e}")
+            return None
+
+        self.stats["routed"] += 1
+        self.stats["llm_calls_saved"] += result.stats.llm_calls_saved
+        self.stats["seconds_saved"] += result.stats.seconds_saved
+        logger.info(f"Fast path {intent.name} took {result.stats.seconds:.1f}s, saved "
+                    f"{result.stats.llm_calls_saved} LLM calls and "
+                    f"~{result.stats.seconds_saved:.1f}s")
+        return result
@@ -0,0 +1,319 @@
+from abc import abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# True while the agent runs a conversation thread that opted out of caching
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+# Message fields that differ between otherwise identical requests
+_VOLATILE_KWARGS = {"id", "tool_call_id", "response_metadata", "usage_metadata", "additional_kwargs"}
+
+
+@contextmanager
+def cache_bypass(bypass: bool = True):
+    """Skip the LLM cache for model calls made inside this block."""
+    token = _bypass.set(bypass)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def _normalize(obj):
+    """Drop message and tool call ids and provider metadata from serialized
+    messages, so the same conversation always gives the same key."""
+    if isinstance(obj, list):
+        return [_normalize(item) for item in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if obj.get("lc") and isinstance(obj.get("kwargs"), dict):
+        kwargs = {k: v for k, v in obj["kwargs"].items() if k not in _VOLATILE_KWARGS}
+        if isinstance(kwargs.get("tool_calls"), list):
+            kwargs["tool_calls"] = [
+                {k: v for k, v in call.items() if k != "id"} for call in kwargs["tool_calls"]
+            ]
+        return {**obj, "kwargs": _normalize(kwargs)}
+    return {k: _normalize(v) for k, v in obj.items()}
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Hash of the normalized messages and the model string.
+
+    For chat models ``prompt`` is the serialized message list and
+    ``llm_string`` holds the model parameters and bound tool schemas.
+    """
+    try:
+        prompt = json.dumps(_normalize(json.loads(prompt)), sort_keys=True)
+    except ValueError:
+        pass
+    return hashlib.sha256(f"{prompt}\x00{llm_string}".encode("utf-8")).hexdigest()
+
+
+class LLMCache(BaseCache):
+    """LangChain model cache with per-thread opt-out and hit/miss stats.
+
+    Subclasses store entries (``_get``/``_put``/``_clear``). Entries expire
+    after ``ttl_seconds`` and at most ``max_entries`` are kept, least
+    recently used first out. Conversation threads passed to
+    ``disable_for_thread`` always call the model.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disabled_threads = set()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        self._lookup_seconds = 0.0
+        self._llm_seconds = 0.0
+        self._llm_calls = 0
+        self._missed_at = {}  # key -> when the lookup missed, to time the model call
+
+    def disable_for_thread(self, thread_id: str):
+        self.disabled_threads.add(thread_id)
+
+    def enable_for_thread(self, thread_id: str):
+        self.disabled_threads.discard(thread_id)
+
+    def is_disabled(self, thread_id: str) -> bool:
+        return thread_id in self.disabled_threads
+
+    def lookup(self, prompt: str, llm_string: str):
+        if _bypass.get():
+            with self._stats_lock:
+                self.bypassed += 1
+            return None
+        start = time.perf_counter()
+        key = cache_key(prompt, llm_string)
+        value = self._get(key)
+        now = time.perf_counter()
+        with self._stats_lock:
+            self._lookup_seconds += now - start
+            if value is None:
+                self.misses += 1
+                if len(self._missed_at) > 1000:
+                    self._missed_at.clear()
+                self._missed_at[key] = now
+            else:
+                self.hits += 1
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        if _bypass.get():
+            return
+        key = cache_key(prompt, llm_string)
+        with self._stats_lock:
+            missed_at = self._missed_at.pop(key, None)
+            if missed_at is not None:
+                self._llm_seconds += time.perf_counter() - missed_at
+                self._llm_calls += 1
+        self._put(key, return_val)
+
+    def clear(self, **kwargs):
+        self._clear()
+
+    def stats(self) -> dict:
+        """Return hits (model calls avoided), misses, lookup latency and the
+        estimated model time saved."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            avg_llm = self._llm_seconds / self._llm_calls if self._llm_calls else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "avg_lookup_ms": 1000 * self._lookup_seconds / lookups if lookups else 0.0,
+                "avg_llm_seconds": avg_llm,
+                "seconds_saved": self.hits * avg_llm,
+                "disabled_threads": len(self.disabled_threads),
+            }
+
+    @abstractmethod
+    def _get(self, key: str):
+        """Stored generations for ``key``, or None if missing or expired."""
+
+    @abstractmethod
+    def _put(self, key: str, value):
+        """Store generations under ``key``."""
+
+    @abstractmethod
+    def _clear(self):
+        """Remove every entry."""
+
+
+class MemoryLLMCache(LLMCache):
+    """In-process LRU cache of model responses."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600.0):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries = OrderedDict()  # key -> (stored_at, generations)
+        self._lock = threading.Lock()
+
+    async def alookup(self, prompt: str, llm_string: str):
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val):
+        self.update(prompt, llm_string, return_val)
+
+    async def aclear(self, **kwargs):
+        self.clear()
+
+    def _get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats["entries"] = len(self._entries)
+        return stats
+
+
+class SQLiteLLMCache(LLMCache):
+    """Model responses cached in SQLite, shared across restarts.
+
+    Expired and least recently used rows are pruned every
+    ``prune_every`` writes.
+    """
+
+    def __init__(self, path: str = "llm_cache.db", max_entries: int = 10000,
+                 ttl_seconds: float = 24 * 3600.0, prune_every: int = 100):
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self.prune_every = prune_every
+        self._writes = 0
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)")
+        atexit.register(self.close)
+
+    def _get(self, key: str):
+        now = time.time()
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        try:
+            return [loads(generation) for generation in json.loads(row[0])]
+        except Exception as e:
+            logger.warning(f"Dropping unreadable LLM cache entry: {e}")
+            return None
+
+    def _put(self, key: str, value):
+        now = time.time()
+        data = json.dumps([dumps(generation) for generation in value])
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)", (key, data, now, now))
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune(now)
+
+    def _prune(self, now: float):
+        """Delete expired rows, then the least recently used beyond max_entries."""
+        expired = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        excess = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN"
+                " (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)", (excess,))
+        self.evictions += expired + max(0, excess)
+
+    def _clear(self):
+        with self._db_lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._db_lock:
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return stats
+
+    def close(self):
+        with self._db_lock:
+            try:
+                self._conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+
+
+def build_llm_cache(backend: str = "memory", **options):
+    """Create an LLM cache for ``backend`` ("memory" or "sqlite")."""
+    if backend == "memory":
+        options.pop("path", None)
+        return MemoryLLMCache(**options)
+    if backend == "sqlite":
+        return SQLiteLLMCache(**options)
+    raise ValueError(f"Unknown LLM cache backend: {backend}")
+
+
+# browser_mcp.json "llmCache" keys -> cache arguments
+_CONFIG_KEYS = {
+    "path": "path",
+    "maxEntries": "max_entries",
+    "ttlSeconds": "ttl_seconds",
+}
+
+
+def llm_cache_from_config(config: dict):
+    """Create an LLM cache from the "llmCache" section of browser_mcp.json,
+    or None if it is disabled."""
+    if not config.get("enabled", False):
+        return None
+    options = {arg: config[key] for key, arg in _CONFIG_KEYS.items() if key in config}
+    cache = build_llm_cache(config.get("backend", "memory"), **options)
+    for thread_id in config.get("disabledThreads", []):
+        cache.disable_for_thread(thread_id)
+    return cache
@@ -2,11 +2,22 @@ from dotenv import load_dotenv
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage
 from mcp_use import MCPAgent, MCPClient
-from flask import Flask, request, jsonify, send_from_directory
+from llm_cache import llm_cache_from_config
+from image_index import ImageIndex
+from flask import Flask, Response, g, request, jsonify, send_file
+from werkzeug.security import safe_join
+from dataclasses import asdict
 import asyncio
+import atexit
+import concurrent.futures
+import hashlib
 import os
 import re
-import glob
+import json
+import math
+import queue
+import threading
+import uuid
 
 app = Flask(__name__)
 
@@ -14,11 +25,19 @@ app = Flask(__name__)
 global_agent = None
 global_client = None
 
+# Each browser gets its own conversation thread, identified by this cookie
+SESSION_COOKIE = "session_id"
+SESSION_MAX_AGE = 30 * 24 * 3600
 
-async def initialize_agent():
-    """Initialize the agent once at startup"""
-    global global_agent, global_client
+# Background event loop shared by every request (see get_event_loop)
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_init_lock = threading.Lock()
 
+
+async def create_agent():
+    """Create an MCPClient and MCPAgent from browser_mcp.json"""
     load_dotenv()
 
     # Check if API key is set
@@ -28,163 +47,230 @@ async def initialize_agent():
     os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
     config_file = "browser_mcp.json"
 
-    global_client = MCPClient.from_config_file(config_file)
-    llm = ChatGroq(model="llama3-70b-8192", max_tokens=250, temperature=0.7)
-    global_agent = await MCPAgent.create(
+    client = MCPClient.from_config_file(config_file)
+    llm = ChatGroq(model="llama3-70b-8192", max_tokens=250, temperature=0.7,
+                   cache=llm_cache_from_config(client.settings.get("llmCache", {})))
+    agent = await MCPAgent.create(
         llm=llm,
-        client=global_client,
+        client=client,
         max_steps=15,
         memory_enabled=True
     )
 
+    return agent, client
+
+
+async def initialize_agent():
+    """Initialize the agent once at startup"""
+    global global_agent, global_client
+
+    global_agent, global_client = await create_agent()
     return global_agent, global_client
 
 
-def run_async_in_sync(coro):
-    """Helper function to run async code in sync context"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+def get_event_loop():
+    """Return the long-lived event loop that owns the agent and MCP sessions.
+
+    The loop runs in a daemon thread and is started on first use. Every
+    coroutine that touches ``global_agent`` or ``global_client`` must run on
+    it, because the MCP sessions are bound to the loop that created them.
+    """
+    global _loop, _loop_thread
+
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, name="mcp-agent-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def run_async_in_sync(coro, timeout=None):
+    """Run a coroutine on the background loop and wait for its result"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+def iterate_async_in_sync(agen):
+    """Iterate an async generator on the background loop from sync code.
+
+    A single task on the loop drains the generator into a queue, so the
+    generator always runs in one task while the caller (e.g. a Flask
+    response generator) consumes items from its own thread.
+    """
+    items = queue.Queue()
+    finished = object()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        finally:
+            items.put(finished)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_event_loop())
     try:
-        return loop.run_until_complete(coro)
+        while True:
+            item = items.get()
+            if item is finished:
+                break
+            yield item
+        future.result()
     finally:
-        loop.close()
+        # Stops the run if the client disconnects mid-stream
+        future.cancel()
 
 
-def get_latest_generated_images():
-    """Get the most recently generated images"""
-    images_dir = 'generated_images'
-    if not os.path.exists(images_dir):
-        return []
+def chat_payload(result):
+    """JSON body for /chat built from the tool artifacts of an AgentResult"""
+    images = list(dict.fromkeys(artifact.name for artifact in result.images))
+    return {
+        "response": result.text,
+        "images": images,
+        "artifacts": [asdict(artifact) for artifact in result.artifacts],
+        "route": result.route,
+        "stopped": result.stopped,
+    }
 
-    # Get all image files with their modification times
-    image_files = []
-    for ext in ['*.png', '*.jpg', '*.jpeg', '*.gif']:
-        pattern = os.path.join(images_dir, ext)
-        files = glob.glob(pattern)
-        for file in files:
-            image_files.append({
-                'filename': os.path.basename(file),
-                'mtime': os.path.getmtime(file)
-            })
 
-    # Sort by modification time (newest first)
-    image_files.sort(key=lambda x: x['mtime'], reverse=True)
+LIMITS_ERROR = "deadline must be a positive number of seconds"
 
-    return [img['filename'] for img in image_files]
 
+def request_limits(data):
+    """Per-request run limits from a /chat JSON body: "deadline" in seconds"""
+    deadline = data.get("deadline")
+    if deadline is None:
+        return {}
+    deadline = float(deadline)
+    if not math.isfinite(deadline) or deadline <= 0:
+        raise ValueError("deadline must be a positive number")
+    return {"deadline": deadline}
 
-def extract_image_paths_from_response(response_text):
-    """Extract image file paths from the agent's response"""
-    # Common patterns for image file references
-    patterns = [
-        r'generated_images[/\\][\w\-_.]+\.(?:png|jpg|jpeg|gif)',
-        r'image_\d+\.(?:png|jpg|jpeg|gif)',
-        r'[\w\-_.]+\.(?:png|jpg|jpeg|gif)',
-    ]
 
-    found_images = []
-    for pattern in patterns:
-        matches = re.findall(pattern, response_text, re.IGNORECASE)
-        found_images.extend(matches)
+def format_sse(event):
+    """Encode an agent stream event as a Server-Sent Events message"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
 
-    return found_images
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
-# Add route to serve generated images
-@app.route('/generated_images/<filename>')
-def serve_image(filename):
-    """Serve images from the generated_images directory"""
-    try:
-        # Make sure the directory exists
-        images_dir = os.path.join(os.getcwd(), 'generated_images')
-        if not os.path.exists(images_dir):
-            return jsonify({"error": "Images directory not found"}), 404
-
-        # Check if file exists
-        file_path = os.path.join(images_dir, filename)
-        if not os.path.exists(file_path):
-            return jsonify({"error": "Image not found"}), 404
 
-        return send_from_directory('generated_images', filename)
-    except Exception as e:
-        return jsonify({"error": f"Error serving image: {str(e)}"}), 500
+def ensure_agent():
+    """Initialize the agent on the background loop if not already done"""
+    with _init_lock:
+        if global_agent is None:
+            run_async_in_sync(initialize_agent())
+    return global_agent
 
 
-@app.route('/latest_images')
-def get_latest_images():
-    """Get the latest generated images"""
-    try:
-        images = get_latest_generated_images()
-        return jsonify({"images": images[:5]})  # Return latest 5 images
-    except Exception as e:
-        return jsonify({"error": f"Error getting images: {str(e)}"}), 500
+def shutdown_event_loop():
+    """Close MCP sessions and stop the background loop"""
+    global _loop
 
+    if _loop is None or _loop.is_closed():
+        return
+    if global_client is not None:
+        try:
+            run_async_in_sync(global_client.close_all_sessions(), timeout=10)
+        except Exception as e:
+            print(f"Error closing MCP sessions: {e}")
+    _loop.call_soon_threadsafe(_loop.stop)
+    if _loop_thread is not None:
+        _loop_thread.join(timeout=5)
+    _loop.close()
+    _loop = None
 
-@app.route('/chat', methods=['POST'])
-def chat():
-    try:
-        user_input = request.json.get('input')
-        if not user_input:
-            return jsonify({"error": "No input provided"}), 400
 
-        # Get images before processing
-        images_before = set(get_latest_generated_images())
+atexit.register(shutdown_event_loop)
 
-        # Initialize agent if not already done
-        if global_agent is None:
-            run_async_in_sync(initialize_agent())
 
-        # Run the agent
-        async def run_chat():
-            response = await global_agent.run(user_input, thread_id="web_thread")
-            return response
+def resolve_session_id(cookie_value):
+    """Return (session_id, is_new) for a session cookie value"""
+    if cookie_value and re.fullmatch(r'[0-9a-f]{32}', cookie_value):
+        return cookie_value, False
+    return uuid.uuid4().hex, True
 
-        response = run_async_in_sync(run_chat())
 
-        # Get images after processing
-        images_after = set(get_latest_generated_images())
+def session_thread_id(session_id):
+    """Conversation thread used by the agent for a web session"""
+    return f"web_{session_id}"
 
-        # Find newly generated images
-        new_images = list(images_after - images_before)
 
-        # Also check for images mentioned in the response
-        mentioned_images = extract_image_paths_from_response(response)
+@app.before_request
+def load_session():
+    g.session_id, g.new_session = resolve_session_id(
+        request.cookies.get(SESSION_COOKIE))
 
-        # Combine and deduplicate
-        all_images = list(
-            set(new_images + [os.path.basename(img) for img in mentioned_images]))
 
-        return jsonify({
-            "response": response,
-            "images": all_images
-        })
+@app.after_request
+def save_session(response):
+    if getattr(g, "new_session", False):
+        response.set_cookie(SESSION_COOKIE, g.session_id,
+                            max_age=SESSION_MAX_AGE, httponly=True, samesite="Lax")
+    return response
 
-    except Exception as e:
-        return jsonify({"error": f"Error processing request: {str(e)}"}), 500
 
+IMAGES_DIR = os.path.join(os.getcwd(), 'generated_images')
 
-@app.route('/clear', methods=['POST'])
-def clear():
-    try:
-        # Initialize agent if not already done
-        if global_agent is None:
-            run_async_in_sync(initialize_agent())
+# Index of generated images, updated incrementally from the image server's manifest
+image_index = ImageIndex(IMAGES_DIR)
 
-        # Clear conversation history
-        async def clear_history():
-            await global_agent.clear_conversation_history(thread_id="web_thread")
+# image_<16 hex digits>.<ext> names are digests of the generation request
+# (prompt, size, model), not of the bytes: once the image server evicts a
+# file, regenerating the same prompt can store a different image under the
+# same name. Browsers may reuse them for a day, then revalidate by ETag.
+CONTENT_ADDRESSED_RE = re.compile(r'image_[0-9a-f]{16}\.(?:png|jpg|gif)')
+IMAGE_MAX_AGE = 24 * 3600
 
-        run_async_in_sync(clear_history())
-        return jsonify({"message": "Conversation history cleared"})
+# path -> (mtime_ns, size, etag), so each file is hashed once
+_etag_cache = {}
+_etag_lock = threading.Lock()
 
-    except Exception as e:
-        return jsonify({"error": f"Error clearing history: {str(e)}"}), 500
 
+def image_file(filename):
+    """Absolute path of a generated image, or None if it does not exist"""
+    path = safe_join(IMAGES_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    return path
 
-@app.route('/')
-def index():
-    """Serve the main HTML page"""
-    return """
+
+def image_etag(path):
+    """Strong ETag for an image: a digest of its bytes"""
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _etag_lock:
+        cached = _etag_cache.get(path)
+    if cached and cached[:2] == key:
+        return cached[2]
+    with open(path, 'rb') as f:
+        etag = hashlib.file_digest(f, 'sha256').hexdigest()[:32]
+    with _etag_lock:
+        _etag_cache[path] = (*key, etag)
+    return etag
+
+
+def image_cache_headers(filename, cache_control):
+    """Cache request-addressed names for a day, revalidate everything else"""
+    if CONTENT_ADDRESSED_RE.fullmatch(filename):
+        cache_control.no_cache = None  # send_file adds no-cache when given no max_age
+        cache_control.public = True
+        cache_control.max_age = IMAGE_MAX_AGE
+    else:
+        cache_control.no_cache = True
+
+
+def get_latest_generated_images(limit=None):
+    """Get the most recently generated images, newest first"""
+    return image_index.latest(limit)
+
+
+INDEX_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -308,35 +394,65 @@ def index():
                     addMessage(message, 'user');
                     input.value = '';
                     
-                    // Show loading indicator
+                    // Show loading indicator until the first token arrives
                     document.getElementById('loading').style.display = 'block';
+                    const reply = addMessage('', 'assistant');
+                    const replyText = reply.querySelector('.reply-text');
                     
                     try {
-                        const response = await fetch('/chat', {
+                        const response = await fetch('/chat/stream', {
                             method: 'POST',
                             headers: { 'Content-Type': 'application/json' },
                             body: JSON.stringify({ input: message })
                         });
                         
-                        const data = await response.json();
+                        if (!response.ok) {
+                            const data = await response.json();
+                            throw new Error(data.error || response.statusText);
+                        }
                         
-                        // Hide loading indicator
-                        document.getElementById('loading').style.display = 'none';
+                        const reader = response.body.getReader();
+                        const decoder = new TextDecoder();
+                        let buffer = '';
                         
-                        if (data.error) {
-                            addMessage('Error: ' + data.error, 'assistant');
-                        } else {
-                            addMessage(data.response, 'assistant');
+                        while (true) {
+                            const { value, done } = await reader.read();
+                            if (done) break;
+                            buffer += decoder.decode(value, { stream: true });
                             
-                            // Display any new images
-                            if (data.images && data.images.length > 0) {
-                                displayImages(data.images);
+                            // SSE messages are separated by a blank line
+                            let boundary;
+                            while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {
+                                const raw = buffer.slice(0, boundary);
+                                buffer = buffer.slice(boundary + 2);
+                                const dataLine = raw.split('\\n').find(line => line.startsWith('data: '));
+                                if (dataLine) {
+                                    handleStreamEvent(JSON.parse(dataLine.slice(6)), replyText);
+                                }
                             }
                         }
                     } catch (error) {
+                        replyText.textContent = 'Error: Failed to get response';
+                    }
+                    document.getElementById('loading').style.display = 'none';
+                }
+
+                function handleStreamEvent(event, replyText) {
+                    const output = document.getElementById('chat-output');
+                    
+                    if (event.type === 'token') {
                         document.getElementById('loading').style.display = 'none';
-                        addMessage('Error: Failed to get response', 'assistant');
+                        replyText.textContent += event.content;
+                    } else if (event.type === 'tool_start') {
+                        addMessage('Using tool: ' + event.name + '...', 'system');
+                    } else if (event.type === 'image') {
+                        displayImages([event.filename]);
+                    } else if (event.type === 'done') {
+                        replyText.textContent = event.content;
+                    } else if (event.type === 'error') {
+                        replyText.textContent = 'Error: ' + event.error;
                     }
+                    output.scrollTop = output.scrollHeight;
                 }
 
                 function displayImages(imageList) {
@@ -394,7 +510,8 @@ def index():
                         messageDiv.innerHTML = `<strong>You:</strong> ${text}`;
                     } else if (sender === 'assistant') {
                         messageDiv.className += ' assistant-message';
-                        messageDiv.innerHTML = `<strong>Assistant:</strong> ${text}`;
+                        messageDiv.innerHTML = '<strong>Assistant:</strong> <span class="reply-text"></span>';
+                        messageDiv.querySelector('.reply-text').textContent = text;
                     } else if (sender === 'system') {
                         messageDiv.className += ' system-message';
                         messageDiv.innerHTML = `<em>${text}</em>`;
@@ -402,6 +519,7 @@ def index():
                     
                     output.appendChild(messageDiv);
                     output.scrollTop = output.scrollHeight;
+                    return messageDiv;
                 }
                 
                 function handleEnter(event) {
@@ -429,6 +547,134 @@ def index():
         """
 
 
+# Add route to serve generated images
+@app.route('/generated_images/<filename>')
+def serve_image(filename):
+    """Serve images from the generated_images directory.
+
+    Responses carry a strong ETag and Last-Modified, answer conditional
+    requests with 304 and byte ranges with 206. The file is handed to the
+    server's wsgi.file_wrapper, which uses sendfile() under servers that
+    support it (e.g. gunicorn).
+    """
+    try:
+        file_path = image_file(filename)
+        if file_path is None:
+            return jsonify({"error": "Image not found"}), 404
+
+        response = send_file(file_path, etag=image_etag(file_path), conditional=True)
+        image_cache_headers(filename, response.cache_control)
+        return response
+    except Exception as e:
+        return jsonify({"error": f"Error serving image: {str(e)}"}), 500
+
+
+@app.route('/latest_images')
+def get_latest_images():
+    """Get the latest generated images"""
+    try:
+        images = get_latest_generated_images(5)
+        return jsonify({"images": images})  # Return latest 5 images
+    except Exception as e:
+        return jsonify({"error": f"Error getting images: {str(e)}"}), 500
+
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    try:
+        user_input = request.json.get('input')
+        if not user_input:
+            return jsonify({"error": "No input provided"}), 400
+        try:
+            limits = request_limits(request.json)
+        except (TypeError, ValueError):
+            return jsonify({"error": LIMITS_ERROR}), 400
+
+        # Initialize agent if not already done
+        agent = ensure_agent()
+
+        # Run the agent on the shared background loop
+        result = run_async_in_sync(
+            agent.run(user_input, thread_id=session_thread_id(g.session_id), **limits))
+        return jsonify(chat_payload(result))
+
+    except Exception as e:
+        return jsonify({"error": f"Error processing request: {str(e)}"}), 500
+
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream tokens, tool events and images as Server-Sent Events"""
+    try:
+        user_input = request.json.get('input')
+        if not user_input:
+            return jsonify({"error": "No input provided"}), 400
+        try:
+            limits = request_limits(request.json)
+        except (TypeError, ValueError):
+            return jsonify({"error": LIMITS_ERROR}), 400
+
+        agent = ensure_agent()
+        thread_id = session_thread_id(g.session_id)
+
+        def generate():
+            for event in iterate_async_in_sync(
+                    agent.stream(user_input, thread_id=thread_id, **limits)):
+                yield format_sse(event)
+
+        return Response(generate(), mimetype="text/event-stream",
+                        headers=SSE_HEADERS)
+
+    except Exception as e:
+        return jsonify({"error": f"Error processing request: {str(e)}"}), 500
+
+
+@app.route('/clear', methods=['POST'])
+def clear():
+    try:
+        # Initialize agent if not already done
+        agent = ensure_agent()
+
+        # Clear conversation history
+        run_async_in_sync(
+            agent.clear_conversation_history(
+                thread_id=session_thread_id(g.session_id)))
+        return jsonify({"message": "Conversation history cleared"})
+
+    except Exception as e:
+        return jsonify({"error": f"Error clearing history: {str(e)}"}), 500
+
+
+@app.route('/memory_stats')
+def memory_stats():
+    """Report live conversation threads and memory held by the agent"""
+    if global_agent is None:
+        return jsonify({})
+    return jsonify(global_agent.memory_stats())
+
+
+@app.route('/router_stats')
+def router_stats():
+    """Report requests served by the intent router and what it saved"""
+    if global_agent is None:
+        return jsonify({})
+    return jsonify(global_agent.router_stats())
+
+
+@app.route('/llm_cache_stats')
+def llm_cache_stats():
+    """Report model calls served from the LLM cache"""
+    if global_agent is None:
+        return jsonify({})
+    return jsonify(global_agent.llm_cache_stats())
+
+
+@app.route('/')
+def index():
+    """Serve the main HTML page"""
+    return INDEX_HTML
+
+
 async def run_memory_chat():
     """CLI version of the chat"""
     load_dotenv()
@@ -442,7 +688,8 @@ async def run_memory_chat():
 
     print("Initializing chat...")
     client = MCPClient.from_config_file(config_file)
-    llm = ChatGroq(model="llama3-70b-8192", temperature=0.7)
+    llm = ChatGroq(model="llama3-70b-8192", temperature=0.7,
+                   cache=llm_cache_from_config(client.settings.get("llmCache", {})))
     agent = await MCPAgent.create(llm=llm, client=client, max_steps=15, memory_enabled=True)
 
     print("\n===== Multi-Tool Creative Agent =====")
@@ -468,8 +715,24 @@ async def run_memory_chat():
 
             print("\nAssistant: ", end="", flush=True)
             try:
-                response = await agent.run(user_input, thread_id="cli_thread")
-                print(response)
+                async for event in agent.stream(user_input, thread_id="cli_thread"):
+                    if event["type"] == "token":
+                        print(event["content"], end="", flush=True)
+                    elif event["type"] == "tool_start":
+                        print(f"\n[Using tool: {event['name']}]", flush=True)
+                    elif event["type"] == "image":
+                        print(f"\n[Image saved: generated_images/{event['filename']}]", flush=True)
+                    elif event["type"] == "done" and event.get("route"):
+                        # Fast-path answers arrive whole rather than as tokens
+                        route = event["route"]
+                        print(f"\n{event['content']}\n[{route['intent']}: saved "
+                              f"{route['llm_calls_saved']} LLM calls, ~{route['seconds_saved']:.1f}s]")
+                    elif event["type"] == "done" and event.get("stopped"):
+                        # The partial answer, ending with the reason the run stopped
+                        print(f"\n{event['content']}")
+                    elif event["type"] == "error":
+                        print(f"\n{event['error']}")
+                print()
             except Exception as e:
                 print(f"\nError: {e}")
     finally:
@@ -480,6 +743,10 @@ if __name__ == "__main__":
     if len(os.sys.argv) > 1 and os.sys.argv[1] == "web":
         print("Starting web server...")
         app.run(host='0.0.0.0', port=int(os.getenv("PORT", 5000)), debug=True)
+    elif len(os.sys.argv) > 1 and os.sys.argv[1] == "asgi":
+        print("Starting async web server...")
+        from asgi_app import serve
+        asyncio.run(serve(host='0.0.0.0', port=int(os.getenv("PORT", 5000))))
     else:
         print("Starting CLI mode...")
         asyncio.run(run_memory_chat())
@@ -1,17 +1,154 @@
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from langchain_core.messages import HumanMessage
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import StructuredTool, ToolException
+from mcp.types import EmbeddedResource, ImageContent, ResourceLink, TextContent
+from session_pool import SessionPool
+from langgraph.errors import GraphRecursionError
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
+from checkpointers import checkpointer_from_config
+from compaction import HistoryCompactor
+from intent_router import IntentRouter
+from llm_cache import LLMCache, cache_bypass
+from collections import Counter
+from dataclasses import asdict, dataclass, field
 import asyncio
 import json
 import logging
+import uuid
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class Artifact:
+    """A non-text output of a tool call, e.g. a generated image."""
+    name: str
+    uri: str = None
+    mime_type: str = None
+    size: int = None
+    meta: dict = field(default_factory=dict)
+
+    @property
+    def is_image(self) -> bool:
+        return bool(self.mime_type and self.mime_type.startswith("image/"))
+
+
+@dataclass
+class AgentResult:
+    """Final answer of a run plus the artifacts its tool calls produced."""
+    text: str
+    artifacts: list = field(default_factory=list)
+    # Set when an intent router fast path served the request (RouteStats)
+    route: dict = None
+    # Why the run was cut short (deadline, token budget or step limit), if it was
+    stopped: str = None
+
+    def __str__(self):
+        return self.text
+
+    @property
+    def images(self) -> list:
+        return [artifact for artifact in self.artifacts if artifact.is_image]
+
+
+def _to_artifact(content):
+    if isinstance(content, ResourceLink):
+        return Artifact(name=content.name, uri=str(content.uri), mime_type=content.mimeType,
+                        size=content.size, meta=dict(content.meta or {}))
+    if isinstance(content, EmbeddedResource):
+        uri = str(content.resource.uri)
+        return Artifact(name=uri.rsplit("/", 1)[-1], uri=uri,
+                        mime_type=content.resource.mimeType)
+    if isinstance(content, ImageContent):
+        # Inline image bytes are not kept in conversation memory
+        return Artifact(name="inline image", mime_type=content.mimeType)
+    return None
+
+
+def _convert_call_tool_result(result):
+    """Split an MCP CallToolResult into (text content, artifacts)."""
+    texts, artifacts = [], []
+    for content in result.content:
+        if isinstance(content, TextContent):
+            texts.append(content.text)
+        else:
+            artifact = _to_artifact(content)
+            if artifact is not None:
+                artifacts.append(artifact)
+
+    text = "\n".join(texts)
+    if result.isError:
+        raise ToolException(text)
+    return text, artifacts or None
+
+
+@dataclass
+class CallLimits:
+    """Timeouts and concurrency cap for one server's tool calls."""
+    timeout: float = 120.0
+    max_concurrent: int = 4
+    tool_timeouts: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.slots = asyncio.Semaphore(self.max_concurrent)
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.tool_timeouts.get(tool_name, self.timeout)
+
+
+def _timeout_result(tool_name: str, server_name: str, timeout: float) -> str:
+    """Tool output telling the model a call was cancelled, so it can answer
+    from the calls that did finish."""
+    return json.dumps({
+        "status": "timeout",
+        "tool": tool_name,
+        "server": server_name,
+        "timeout_seconds": timeout,
+        "message": "The tool did not finish in time and was cancelled. Use the results "
+                   "of the other tools, or retry later with a simpler request.",
+    })
+
+
+def _fingerprint(connection: dict) -> str:
+    return json.dumps(connection, sort_keys=True, default=str)
+
+
 class MCPClient(MultiServerMCPClient):
+    """MultiServerMCPClient whose tools run on pooled, long-lived sessions.
+
+    The base client opens a new stdio session (and spawns a new server
+    process) for every tool call. Here each configured server gets a
+    SessionPool of warm sessions that are started on first use and reused
+    until close_all_sessions() drains them.
+    """
+
+    def __init__(self, connections: dict = None, pool_size: int = 1,
+                 health_check_interval: float = 30.0, settings: dict = None):
+        connections = {name: dict(conn) for name, conn in (connections or {}).items()}
+        # Non-server sections of the config file (e.g. "memory")
+        self.settings = settings or {}
+        # Per-server pool sizes and call limits are ours, not the transport's
+        self.pool_sizes = {
+            name: conn.pop("poolSize", pool_size) for name, conn in connections.items()
+        }
+        self.call_limits = {
+            name: self._call_limits(conn) for name, conn in connections.items()
+        }
+        self.timeouts = Counter()
+        super().__init__(connections)
+        self.health_check_interval = health_check_interval
+        self.pools = {}
+        self._pools_lock = asyncio.Lock()
+        # Tool catalogue: server name -> tools, filled by the first discovery
+        self._tool_cache = {}
+        self._config_fingerprints = {
+            name: _fingerprint(conn) for name, conn in self.connections.items()
+        }
+        self.catalogue_version = 0
+
     @classmethod
     def from_config_file(cls, config_file: str):
         """Initialize MCPClient from a JSON config file."""
@@ -19,7 +156,13 @@ class MCPClient(MultiServerMCPClient):
             with open(config_file, 'r') as f:
                 config = json.load(f)
             logger.info(f"Loaded MCP config from {config_file}")
-            return cls(config.get("mcpServers", {}))
+            pool_config = config.get("sessionPool", {})
+            return cls(
+                config.get("mcpServers", {}),
+                pool_size=pool_config.get("size", 1),
+                health_check_interval=pool_config.get("healthCheckInterval", 30.0),
+                settings={k: v for k, v in config.items() if k != "mcpServers"},
+            )
         except FileNotFoundError:
             logger.error(f"Config file {config_file} not found")
             raise
@@ -27,43 +170,300 @@ class MCPClient(MultiServerMCPClient):
             logger.error(f"Invalid JSON in config file: {e}")
             raise
 
+    async def start_pools(self):
+        """Start a session pool for every configured server (idempotent)."""
+        async with self._pools_lock:
+            pending = {
+                name: SessionPool(
+                    self, name,
+                    size=self.pool_sizes.get(name, 1),
+                    health_check_interval=self.health_check_interval,
+                )
+                for name in self.connections if name not in self.pools
+            }
+            if not pending:
+                return
+            results = await asyncio.gather(
+                *(pool.start() for pool in pending.values()), return_exceptions=True)
+            for (name, pool), result in zip(pending.items(), results):
+                if isinstance(result, BaseException):
+                    logger.error(f"Failed to start MCP server {name}: {result}")
+                    await pool.aclose()
+                else:
+                    pool.on_restart = self.invalidate_tools
+                    self.pools[name] = pool
+
+    def _call_limits(self, connection: dict) -> CallLimits:
+        """Pop a server's call limits off its config, defaulting to the
+        "toolExecution" section."""
+        defaults = self.settings.get("toolExecution", {})
+        return CallLimits(
+            timeout=connection.pop("toolTimeout", defaults.get("timeout", 120.0)),
+            max_concurrent=connection.pop(
+                "maxConcurrentCalls", defaults.get("maxConcurrentCalls", 4)),
+            tool_timeouts=connection.pop("toolTimeouts", {}),
+        )
+
+    def _make_pooled_tool(self, server_name: str, pool: SessionPool, tool):
+        async def invoke(arguments: dict):
+            async with pool.checkout() as session:
+                result = await session.call_tool(tool.name, arguments)
+            return _convert_call_tool_result(result)
+
+        async def call_tool(**arguments):
+            # The prebuilt ToolNode runs a turn's tool calls concurrently; the
+            # limits stop one slow call (e.g. a hung download) from stalling it.
+            # The timeout starts once a slot is free, so queueing behind other
+            # calls to the same server does not count against it.
+            limits = self.call_limits.get(server_name) or CallLimits()
+            timeout = limits.timeout_for(tool.name)
+            try:
+                async with limits.slots:
+                    return await asyncio.wait_for(invoke(arguments), timeout)
+            except asyncio.TimeoutError:
+                self.timeouts[server_name] += 1
+                logger.warning(f"Tool {tool.name} on {server_name} timed out after {timeout}s")
+                return _timeout_result(tool.name, server_name, timeout), None
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description or "",
+            args_schema=tool.inputSchema,
+            coroutine=call_tool,
+            response_format="content_and_artifact",
+            metadata={"server": server_name},
+        )
+
+    async def _list_server_tools(self, server_name: str, pool: SessionPool):
+        tools, cursor = [], None
+        async with pool.checkout() as session:
+            while True:
+                page = await session.list_tools(cursor=cursor)
+                tools.extend(page.tools)
+                cursor = page.nextCursor
+                if not cursor:
+                    break
+        return [self._make_pooled_tool(server_name, pool, tool) for tool in tools]
+
+    async def get_tools(self, *, server_name: str = None):
+        """Get LangChain tools backed by the session pools.
+
+        Tool schemas are discovered once per server and served from the
+        catalogue cache afterwards; see invalidate_tools().
+        """
+        await self.start_pools()
+        names = [server_name] if server_name else list(self.pools)
+        missing = [name for name in names if name not in self._tool_cache]
+        results = await asyncio.gather(
+            *(self._list_server_tools(name, self.pools[name]) for name in missing))
+        for name, server_tools in zip(missing, results):
+            self._tool_cache[name] = server_tools
+            logger.info(f"Cached {len(server_tools)} tools from {name}")
+        return [tool for name in names for tool in self._tool_cache.get(name, [])]
+
+    def invalidate_tools(self, server_name: str = None):
+        """Drop cached tool schemas for one server, or for all of them."""
+        if server_name is None:
+            self._tool_cache.clear()
+        else:
+            self._tool_cache.pop(server_name, None)
+        self.catalogue_version += 1
+        logger.info(f"Invalidated tool catalogue for {server_name or 'all servers'}")
+
+    def list_tools_by_server(self) -> dict:
+        """Return the cached tool names and descriptions for each server.
+
+        This never contacts the servers; servers whose tools have not been
+        discovered yet are omitted.
+        """
+        return {
+            name: [{"name": tool.name, "description": tool.description} for tool in tools]
+            for name, tools in self._tool_cache.items()
+        }
+
+    async def update_connections(self, connections: dict):
+        """Apply a new server configuration.
+
+        Servers whose configuration changed or that were removed have their
+        pools closed and their cached tools dropped; unchanged servers keep
+        their warm sessions and catalogue.
+        """
+        connections = {name: dict(conn) for name, conn in connections.items()}
+        pool_sizes = {
+            name: conn.pop("poolSize", self.pool_sizes.get(name, 1))
+            for name, conn in connections.items()
+        }
+        # Limits are read on every call, so they apply without a restart
+        self.call_limits = {
+            name: self._call_limits(conn) for name, conn in connections.items()
+        }
+        fingerprints = {name: _fingerprint(conn) for name, conn in connections.items()}
+        changed = [
+            name for name in set(self.connections) | set(connections)
+            if self._config_fingerprints.get(name) != fingerprints.get(name)
+            or self.pool_sizes.get(name) != pool_sizes.get(name)
+        ]
+
+        async with self._pools_lock:
+            stale = [self.pools.pop(name) for name in changed if name in self.pools]
+        await asyncio.gather(*(pool.aclose() for pool in stale))
+
+        self.connections = connections
+        self.pool_sizes = pool_sizes
+        self._config_fingerprints = fingerprints
+        for name in changed:
+            self.invalidate_tools(name)
+
+    def pool_stats(self) -> dict:
+        """Return idle/in-use/restart and tool timeout counts for every
+        session pool."""
+        return {
+            name: {**pool.stats(), "timeouts": self.timeouts[name]}
+            for name, pool in self.pools.items()
+        }
+
     async def close_all_sessions(self):
-        """Close all active MCP server sessions."""
+        """Drain every session pool and shut the MCP servers down."""
         try:
-            for session in self.sessions.values():
-                await session.aclose()
+            pools = list(self.pools.values())
+            self.pools = {}
+            await asyncio.gather(*(pool.aclose() for pool in pools))
             logger.info("All MCP sessions closed successfully")
         except Exception as e:
             logger.error(f"Error closing MCP sessions: {e}")
 
 
+class TokenBudgetExceeded(Exception):
+    pass
+
+
+class TokenBudget(AsyncCallbackHandler):
+    """Counts the tokens a run's LLM calls use and stops the run once they
+    pass ``max_tokens``."""
+    raise_error = True
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self.used = 0
+
+    async def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.used += usage.get("total_tokens", 0)
+        if self.used > self.max_tokens:
+            raise TokenBudgetExceeded(f"token budget of {self.max_tokens} used up ({self.used} tokens)")
+
+
+async def _until(agen, deadline_at: float = None):
+    """Iterate ``agen``, raising asyncio.TimeoutError (and cancelling the
+    pending step, e.g. an LLM or tool call) once the loop clock passes
+    ``deadline_at``."""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            timeout = None if deadline_at is None else max(0.0, deadline_at - loop.time())
+            try:
+                item = await asyncio.wait_for(agen.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await agen.aclose()
+
+
+def _stop_reason(error: Exception) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "deadline reached"
+    if isinstance(error, GraphRecursionError):
+        return "step limit reached"
+    return str(error)
+
+
+def _partial_answer(messages: list, reason: str, partial_text: str = "") -> str:
+    """Best-effort answer from what a cut-short run produced."""
+    turn = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        turn.insert(0, message)
+    ai_text = partial_text or next(
+        (m.content for m in reversed(turn)
+         if isinstance(m, AIMessage) and isinstance(m.content, str) and m.content.strip()), "")
+    results = [f"- {m.name}: {str(m.content)[:500]}" for m in turn if isinstance(m, ToolMessage)]
+
+    parts = [f"[Stopped early: {reason}.]"]
+    if ai_text:
+        parts.append(ai_text)
+    if results:
+        parts.append("Results so far:\n" + "\n".join(results))
+    if len(parts) == 1:
+        parts.append("Nothing was completed in time; please try a simpler request.")
+    return "\n\n".join(parts)
+
+
+def _turn_artifacts(messages: list) -> list:
+    """Artifacts from tool results after the latest human message."""
+    artifacts = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage) and message.artifact:
+            artifacts[:0] = [a for a in message.artifact if isinstance(a, Artifact)]
+    return artifacts
+
+
 class MCPAgent:
     def __init__(self, llm, client: MCPClient, max_steps: int = 10, memory_enabled: bool = False):
         """Initialize an MCPAgent with an LLM, MCP client, and optional memory."""
         raise RuntimeError("Use async MCPAgent.create() instead.")
 
     @classmethod
-    async def create(cls, llm, client: MCPClient, max_steps: int = 10, memory_enabled: bool = False):
-        """Async constructor for MCPAgent."""
+    async def create(cls, llm, client: MCPClient, max_steps: int = 10, memory_enabled: bool = False,
+                     checkpointer=None, memory_backend: str = None, compactor=None, router=None):
+        """Async constructor for MCPAgent.
+
+        With memory enabled, conversations are kept by ``checkpointer`` if
+        given, otherwise by the backend named in ``memory_backend`` or in the
+        "memory" section of the client's config ("memory" by default, or
+        "sqlite" for durable storage).
+
+        ``compactor`` (a HistoryCompactor) trims the history sent to the
+        model on each call; by default it is built from the "compaction"
+        section of the client's config.
+
+        ``router`` (an IntentRouter) serves recognized requests with a fixed
+        plan before the ReAct loop; by default it is built from the
+        "intentRouter" section of the client's config.
+
+        Every run is limited to ``max_steps`` model calls, and by default to
+        the deadline and token budget in the "limits" section of the
+        client's config; run() and stream() accept tighter per-request ones.
+        """
         self = cls.__new__(cls)
         self.llm = llm
         self.client = client
         self.max_steps = max_steps
         self.memory_enabled = memory_enabled
-        self.checkpointer = MemorySaver() if memory_enabled else None
+        if memory_enabled:
+            self.checkpointer = checkpointer or checkpointer_from_config(
+                client.settings.get("memory", {}), backend=memory_backend)
+        else:
+            self.checkpointer = None
+        if compactor is None:
+            compactor = HistoryCompactor.from_config(client.settings.get("compaction", {}))
+        self.compactor = compactor
+        self.last_tokens_saved = 0
+        if router is None:
+            router = IntentRouter.from_config(client.settings.get("intentRouter", {}))
+        self.router = router
+        limits = client.settings.get("limits", {})
+        self.deadline = limits.get("deadlineSeconds")
+        self.max_tokens = limits.get("maxTokens")
 
         try:
-            # Await get_tools since it's async
-            tools = await client.get_tools()
-            logger.info(f"Loaded {len(tools)} tools from MCP servers")
-
-            # Create ReAct agent with checkpointer for memory
-            self.agent = create_react_agent(
-                model=llm,
-                tools=tools,
-                checkpointer=self.checkpointer
-            )
-
+            await self._build_agent()
             logger.info("MCPAgent created successfully")
             return self
 
@@ -71,32 +471,251 @@ class MCPAgent:
             logger.error(f"Error creating MCPAgent: {e}")
             raise
 
-    async def run(self, user_input: str, thread_id: str = "default") -> str:
-        """Run the agent with user input and return the response."""
+    async def _build_agent(self):
+        """(Re)build the ReAct graph from the client's tool catalogue."""
+        version = self.client.catalogue_version
+        tools = await self.client.get_tools()
+        logger.info(f"Loaded {len(tools)} tools from MCP servers")
+
+        self.tools = {tool.name: tool for tool in tools}
+
+        # Create ReAct agent with checkpointer for memory
+        self.agent = create_react_agent(
+            model=self.llm,
+            tools=tools,
+            checkpointer=self.checkpointer,
+            pre_model_hook=self.compactor
+        )
+        self.catalogue_version = version
+
+    async def _ensure_current_tools(self):
+        """Rebuild the graph if a server restarted or its config changed."""
+        if self.catalogue_version != self.client.catalogue_version:
+            logger.info("Tool catalogue changed, rebuilding agent")
+            await self._build_agent()
+
+    def _run_limits(self, deadline: float = None, max_tokens: int = None):
+        """Loop-clock deadline and token budget for one run.
+
+        Per-request values can only tighten the configured ones.
+        """
+        deadline = min(filter(None, (deadline, self.deadline)), default=None)
+        max_tokens = min(filter(None, (max_tokens, self.max_tokens)), default=None)
+        deadline_at = asyncio.get_running_loop().time() + deadline if deadline else None
+        budget = TokenBudget(max_tokens) if max_tokens else None
+        return deadline_at, budget
+
+    def _run_config(self, thread_id: str, budget: TokenBudget = None) -> dict:
+        config = {"configurable": {"thread_id": thread_id}
+                  } if self.memory_enabled else {}
+        # Each ReAct step is a pre-model hook, a model call and a tools call
+        config["recursion_limit"] = self.max_steps * 3 + 1
+        if budget is not None:
+            config["callbacks"] = [budget]
+        return config
+
+    async def _close_cut_short_turn(self, config: dict, question: HumanMessage,
+                                    answer: str, reason: str):
+        """Answer any tool calls a cut-short run left open and store the
+        partial answer, so the thread stays valid for the next turn.
+
+        If the run was cut off before ``question`` was checkpointed (e.g.
+        during the fast path), it is stored along with the answer.
+        """
+        if not self.memory_enabled:
+            return
+        try:
+            state = await self.agent.aget_state(config)
+            messages = state.values.get("messages", [])
+            if any(m.id == question.id for m in messages):
+                answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+                pending = [
+                    call for m in messages[-1:] if isinstance(m, AIMessage)
+                    for call in m.tool_calls if call["id"] not in answered
+                ]
+                updates = [
+                    ToolMessage(content=f"Cancelled: {reason}", tool_call_id=call["id"],
+                                name=call["name"])
+                    for call in pending
+                ]
+            else:
+                updates = [question]
+            await self.agent.aupdate_state(
+                config, {"messages": updates + [AIMessage(content=answer)]}, as_node="agent")
+        except Exception as e:
+            logger.error(f"Error closing cut-short turn: {e}")
+
+    async def run(self, user_input: str, thread_id: str = "default",
+                  deadline: float = None, max_tokens: int = None) -> AgentResult:
+        """Run the agent with user input.
+
+        Returns an AgentResult with the final answer and the artifacts (such
+        as generated images) returned by this turn's tool calls. ``deadline``
+        (seconds) and ``max_tokens`` bound this run; when one is hit, the
+        pending LLM or tool call is cancelled and a partial answer returned.
+        """
+        with self._cache_scope(thread_id):
+            return await self._run(user_input, thread_id, deadline, max_tokens)
+
+    def _cache_scope(self, thread_id: str):
+        """Bypass the model's LLMCache for threads that opted out of it."""
+        cache = getattr(self.llm, "cache", None)
+        return cache_bypass(isinstance(cache, LLMCache) and cache.is_disabled(thread_id))
+
+    async def _run(self, user_input: str, thread_id: str, deadline: float, max_tokens: int):
+        messages = [HumanMessage(content=user_input, id=str(uuid.uuid4()))]
+        state = {"messages": messages}
         try:
             logger.info(f"Processing user input for thread {thread_id}")
-            messages = [HumanMessage(content=user_input)]
-            config = {"configurable": {"thread_id": thread_id}
-                      } if self.memory_enabled else {}
+            deadline_at, budget = self._run_limits(deadline, max_tokens)
+            config = self._run_config(thread_id, budget)
+            await self._ensure_current_tools()
+
+            fast = await self._run_fast_path(messages[0], config, deadline_at)
+            if fast is not None:
+                return fast
 
-            response = await self.agent.ainvoke({"messages": messages}, config)
-            output = response["messages"][-1].content
+            async for state in _until(self.agent.astream(
+                    {"messages": messages}, config, stream_mode="values"), deadline_at):
+                pass
+            output = state["messages"][-1].content
+            self._record_compaction(thread_id)
 
             logger.info("Successfully processed user input")
-            return output
+            return AgentResult(output, _turn_artifacts(state["messages"]))
+
+        except (asyncio.TimeoutError, TokenBudgetExceeded, GraphRecursionError) as e:
+            reason = _stop_reason(e)
+            logger.warning(f"Run for thread {thread_id} stopped early: {reason}")
+            answer = _partial_answer(state["messages"], reason)
+            await self._close_cut_short_turn(config, messages[0], answer, reason)
+            return AgentResult(answer, _turn_artifacts(state["messages"]), stopped=reason)
 
         except Exception as e:
             error_msg = f"Error processing request: {str(e)}"
             logger.error(error_msg)
-            return error_msg
+            return AgentResult(error_msg)
+
+    async def _run_fast_path(self, question: HumanMessage, config: dict,
+                             deadline_at: float = None):
+        """Serve the request through the intent router if it recognizes it.
+
+        The plan's tool calls and answer are written to the thread's memory,
+        so follow-ups (e.g. continue_story) work as after a ReAct run.
+        """
+        if self.router is None:
+            return None
+        timeout = None
+        if deadline_at is not None:
+            timeout = max(0.0, deadline_at - asyncio.get_running_loop().time())
+        result = await asyncio.wait_for(
+            self.router.run(question.content, self.tools, self.llm), timeout)
+        if result is None:
+            return None
+        messages = [question, *result.messages]
+        if self.memory_enabled:
+            await self.agent.aupdate_state(config, {"messages": messages}, as_node="agent")
+        return AgentResult(result.text, _turn_artifacts(messages), route=asdict(result.stats))
+
+    def _record_compaction(self, thread_id: str):
+        if self.compactor is None:
+            return
+        self.last_tokens_saved = self.compactor.pop_turn_savings(thread_id)
+        if self.last_tokens_saved:
+            logger.info(f"History compaction saved ~{self.last_tokens_saved} tokens this turn")
+
+    async def stream(self, user_input: str, thread_id: str = "default",
+                     deadline: float = None, max_tokens: int = None):
+        """Run the agent and yield events as soon as they are produced.
+
+        Each event is a dict with a ``type`` key:
+
+        - ``token``: a chunk of LLM output (``content``)
+        - ``tool_start``: a tool call began (``name``, ``input``)
+        - ``tool_end``: a tool call finished (``name``, ``output``)
+        - ``image``: a tool produced an image (``filename`` and ``artifact``)
+        - ``done``: the run finished (``content`` is the final answer, and
+          ``route`` the fast-path stats if the intent router served it)
+        - ``error``: the run failed (``error``)
+
+        If a limit cuts the run short, ``done`` carries a best-effort
+        partial answer and ``stopped`` gives the reason.
+        """
+        with self._cache_scope(thread_id):
+            async for event in self._stream(user_input, thread_id, deadline, max_tokens):
+                yield event
+
+    async def _stream(self, user_input: str, thread_id: str, deadline: float, max_tokens: int):
+        messages = [HumanMessage(content=user_input, id=str(uuid.uuid4()))]
+        # Messages of this turn seen so far, for a partial answer
+        seen = list(messages)
+        # Text of the most recent model call; the last one is the answer
+        current = []
+        try:
+            logger.info(f"Streaming user input for thread {thread_id}")
+            deadline_at, budget = self._run_limits(deadline, max_tokens)
+            config = self._run_config(thread_id, budget)
+            await self._ensure_current_tools()
+
+            fast = await self._run_fast_path(messages[0], config, deadline_at)
+            if fast is not None:
+                for artifact in fast.images:
+                    yield {"type": "image", "filename": artifact.name,
+                           "artifact": asdict(artifact)}
+                yield {"type": "done", "content": fast.text, "route": fast.route}
+                return
+
+            async for event in _until(self.agent.astream_events(
+                    {"messages": messages}, config, version="v2"), deadline_at):
+                kind = event["event"]
+                if kind == "on_chat_model_start":
+                    current = []
+                elif kind == "on_chat_model_stream":
+                    text = event["data"]["chunk"].content
+                    if isinstance(text, str) and text:
+                        current.append(text)
+                        yield {"type": "token", "content": text}
+                elif kind == "on_chat_model_end" and not current:
+                    # Cached responses arrive whole, without stream events
+                    text = getattr(event["data"].get("output"), "content", None)
+                    if isinstance(text, str) and text:
+                        current.append(text)
+                        yield {"type": "token", "content": text}
+                elif kind == "on_tool_start":
+                    yield {"type": "tool_start", "name": event["name"],
+                           "input": event["data"].get("input")}
+                elif kind == "on_tool_end":
+                    output = event["data"].get("output")
+                    if isinstance(output, ToolMessage):
+                        seen.append(output)
+                    text = str(getattr(output, "content", output))
+                    yield {"type": "tool_end", "name": event["name"], "output": text}
+                    for artifact in getattr(output, "artifact", None) or []:
+                        if isinstance(artifact, Artifact) and artifact.is_image:
+                            yield {"type": "image", "filename": artifact.name,
+                                   "artifact": asdict(artifact)}
+
+            self._record_compaction(thread_id)
+            logger.info("Successfully streamed user input")
+            yield {"type": "done", "content": "".join(current)}
+
+        except (asyncio.TimeoutError, TokenBudgetExceeded, GraphRecursionError) as e:
+            reason = _stop_reason(e)
+            logger.warning(f"Stream for thread {thread_id} stopped early: {reason}")
+            answer = _partial_answer(seen, reason, "".join(current))
+            await self._close_cut_short_turn(config, messages[0], answer, reason)
+            yield {"type": "done", "content": answer, "stopped": reason}
+
+        except Exception as e:
+            error_msg = f"Error processing request: {str(e)}"
+            logger.error(error_msg)
+            yield {"type": "error", "error": error_msg}
 
     async def clear_conversation_history(self, thread_id: str = "default"):
         """Clear the conversation memory for a given thread_id."""
         if self.memory_enabled and self.checkpointer:
             try:
-                # Clear checkpoint by resetting the thread
-                config = {"configurable": {"thread_id": thread_id}}
-                self.checkpointer.put(config, {}, {})
+                await self.checkpointer.adelete_thread(thread_id)
                 logger.info(
                     f"Cleared conversation history for thread {thread_id}")
             except Exception as e:
@@ -104,11 +723,33 @@ class MCPAgent:
         else:
             logger.warning("Memory not enabled or checkpointer not available")
 
+    def router_stats(self) -> dict:
+        """Requests served by the intent router and the LLM calls and
+        seconds it saved."""
+        return dict(self.router.stats) if self.router is not None else {}
+
+    def llm_cache_stats(self) -> dict:
+        """Return the model cache's hits (Groq calls avoided), misses and
+        latency, if the model has an LLMCache."""
+        cache = getattr(self.llm, "cache", None)
+        return cache.stats() if isinstance(cache, LLMCache) else {}
+
+    def memory_stats(self) -> dict:
+        """Return checkpointer metrics (live threads, bytes held, evictions)."""
+        if self.checkpointer is not None and hasattr(self.checkpointer, "stats"):
+            return self.checkpointer.stats()
+        return {}
+
     async def get_available_tools(self):
         """Get list of available tools."""
         try:
-            tools = await self.client.get_tools()
-            return [{"name": tool.name, "description": tool.description} for tool in tools]
+            if not self.client.list_tools_by_server():
+                await self.client.get_tools()
+            return [
+                tool
+                for server_tools in self.client.list_tools_by_server().values()
+                for tool in server_tools
+            ]
         except Exception as e:
             logger.error(f"Error getting tools: {e}")
             return []
@@ -0,0 +1,272 @@
+from contextlib import asynccontextmanager
+from collections import deque
+import asyncio
+import logging
+
+import anyio
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the server process or its stdio pipes are gone
+TRANSPORT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+    EOFError,
+)
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """Return True if an error means the session can no longer be used."""
+    if isinstance(error, TRANSPORT_ERRORS):
+        return True
+    return isinstance(error, McpError) and error.error.code == CONNECTION_CLOSED
+
+
+class PooledSession:
+    """A single warm MCP session kept open by a dedicated task.
+
+    The stdio transport uses anyio cancel scopes that must be entered and
+    exited by the same task, so each session lives inside its own task for
+    its whole lifetime instead of being held open by the caller.
+    """
+
+    def __init__(self, client, server_name: str):
+        self.client = client
+        self.server_name = server_name
+        self.session = None
+        self.broken = False
+        self._ready = None
+        self._closing = None
+        self._task = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and not self.broken and not self._task.done()
+
+    async def start(self):
+        """Spawn the server and wait for the MCP handshake to finish."""
+        loop = asyncio.get_running_loop()
+        self._ready = loop.create_future()
+        self._closing = asyncio.Event()
+        self._task = asyncio.create_task(
+            self._run(), name=f"mcp-session-{self.server_name}")
+        await self._ready
+
+    async def _run(self):
+        try:
+            async with self.client.session(self.server_name) as session:
+                self.session = session
+                self._ready.set_result(None)
+                await self._closing.wait()
+        except BaseException as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            elif not self._closing.is_set():
+                logger.warning(f"MCP session for {self.server_name} exited: {e}")
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self.session = None
+            self.broken = True
+
+    async def ping(self, timeout: float):
+        await asyncio.wait_for(self.session.send_ping(), timeout)
+
+    async def aclose(self, timeout: float = 5.0):
+        """Shut the session down and wait for the server process to exit."""
+        if self._task is None or self._task.done():
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
+            try:
+                await self._task
+            except BaseException:
+                pass
+
+
+class SessionPool:
+    """A fixed-size pool of warm sessions to one MCP server.
+
+    Sessions are checked out for the duration of a single tool call, so up
+    to ``size`` calls to the same server run in parallel. A background task
+    pings idle sessions every ``health_check_interval`` seconds and replaces
+    any that fail; sessions that raise transport errors during a call are
+    replaced as soon as they are returned.
+    """
+
+    def __init__(self, client, server_name: str, size: int = 1,
+                 health_check_interval: float = 30.0, ping_timeout: float = 5.0):
+        self.client = client
+        self.server_name = server_name
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self.restarts = 0
+        self.on_restart = None
+        self._idle = deque()
+        self._members = set()
+        self._in_use = 0
+        self._closed = False
+        self._cond = asyncio.Condition()
+        self._health_task = None
+        self._background = set()
+
+    async def start(self):
+        """Spawn all sessions concurrently and start health checks."""
+        members = await asyncio.gather(
+            *(self._spawn() for _ in range(self.size)))
+        async with self._cond:
+            self._idle.extend(members)
+            self._cond.notify_all()
+        if self.health_check_interval:
+            self._health_task = asyncio.create_task(
+                self._health_loop(), name=f"mcp-health-{self.server_name}")
+        logger.info(
+            f"Started {self.size} pooled session(s) for {self.server_name}")
+
+    async def _spawn(self, attempts: int = 3) -> PooledSession:
+        delay = 0.5
+        for attempt in range(1, attempts + 1):
+            member = PooledSession(self.client, self.server_name)
+            try:
+                await member.start()
+                self._members.add(member)
+                return member
+            except Exception as e:
+                if attempt == attempts:
+                    raise
+                logger.warning(
+                    f"Failed to start {self.server_name} (attempt {attempt}): {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def _respawn(self, member: PooledSession) -> PooledSession:
+        """Close a dead session and start a fresh one in its place."""
+        self._members.discard(member)
+        await member.aclose()
+        if self._closed:
+            raise RuntimeError(f"Session pool for {self.server_name} is closed")
+        replacement = await self._spawn()
+        self.restarts += 1
+        logger.info(f"Respawned MCP server {self.server_name}")
+        if self.on_restart is not None:
+            self.on_restart(self.server_name)
+        return replacement
+
+    async def _replace(self, member: PooledSession):
+        """Respawn a session in the background and return it to the pool."""
+        try:
+            replacement = await self._respawn(member)
+        except Exception as e:
+            if not self._closed:
+                logger.error(f"Could not respawn {self.server_name}: {e}")
+            return
+        async with self._cond:
+            if not self._closed:
+                self._idle.append(replacement)
+                self._cond.notify()
+                return
+        self._members.discard(replacement)
+        await replacement.aclose()
+
+    def _replace_later(self, member: PooledSession):
+        task = asyncio.create_task(self._replace(member))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @asynccontextmanager
+    async def checkout(self):
+        """Borrow an idle session for one call."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._idle or self._closed)
+            if self._closed:
+                raise RuntimeError(f"Session pool for {self.server_name} is closed")
+            member = self._idle.popleft()
+            self._in_use += 1
+
+        try:
+            if not member.alive:
+                member = await self._respawn(member)
+            yield member.session
+        except BaseException as e:
+            if is_transport_error(e):
+                member.broken = True
+            raise
+        finally:
+            async with self._cond:
+                self._in_use -= 1
+                if not member.broken:
+                    self._idle.append(member)
+                self._cond.notify_all()
+            if member.broken:
+                self._replace_later(member)
+
+    async def _health_loop(self):
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+            async with self._cond:
+                idle = list(self._idle)
+            results = await asyncio.gather(
+                *(m.ping(self.ping_timeout) for m in idle if m.alive),
+                return_exceptions=True)
+            pinged = [m for m in idle if m.alive]
+            dead = [m for m in idle if not m.alive]
+            dead += [m for m, r in zip(pinged, results) if isinstance(r, BaseException)]
+            for member in dead:
+                async with self._cond:
+                    if member not in self._idle:
+                        continue
+                    self._idle.remove(member)
+                logger.warning(f"Health check failed for {self.server_name}")
+                member.broken = True
+                await self._replace(member)
+            # Top the pool back up if an earlier respawn failed
+            missing = self.size - len(self._members)
+            for _ in range(missing):
+                try:
+                    replacement = await self._spawn()
+                except Exception as e:
+                    logger.error(f"Could not respawn {self.server_name}: {e}")
+                    break
+                async with self._cond:
+                    self._idle.append(replacement)
+                    self._cond.notify()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "restarts": self.restarts,
+        }
+
+    async def aclose(self, drain_timeout: float = 30.0):
+        """Stop handing out sessions, wait for in-flight calls, then close."""
+        async with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self._in_use == 0), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Closing {self.server_name} with {self._in_use} call(s) in flight")
+            self._idle.clear()
+        for task in [self._health_task, *self._background]:
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+        members = list(self._members)
+        self._members.clear()
+        await asyncio.gather(*(m.aclose() for m in members))
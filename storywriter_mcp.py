@@ -1,17 +1,337 @@
 from fastmcp import FastMCP
 from langchain_groq import ChatGroq
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+import asyncio
+import hashlib
+import httpx
+import json
+import os
 import random
+import re
+import sqlite3
+import time
+import uuid
 
 load_dotenv()
 
-mcp = FastMCP("storywriter")
+STORY_MODEL = os.getenv("STORYWRITER_MODEL", "llama3-70b-8192")
+STORY_TEMPERATURE = float(os.getenv("STORYWRITER_TEMPERATURE", 0.8))
+# Point at a local stub server to test without calling Groq
+GROQ_BASE_URL = os.getenv("STORYWRITER_BASE_URL")
+REQUEST_TIMEOUT = float(os.getenv("STORYWRITER_REQUEST_TIMEOUT", 60))
+# Stories kept for continue_story/get_story, least recently used dropped first
+MAX_STORIES = int(os.getenv("STORYWRITER_MAX_STORIES", 500))
+# Shared by every server process: the agent pools several sessions per server
+# and a follow-up call may land on a different one than write_story did
+STORY_DB_PATH = os.getenv("STORYWRITER_DB_PATH", "stories.db")
+# Paragraphs sent verbatim when continuing; earlier ones go in as a summary
+TAIL_PARAGRAPHS = int(os.getenv("STORYWRITER_TAIL_PARAGRAPHS", 3))
+SUMMARY_WORDS = 150
+SUMMARY_TEMPERATURE = 0.2
+# Sampling is random at temperature 0.8, so story results are only cached when
+# a seed makes Groq's output repeatable or STORYWRITER_CACHE=reuse accepts
+# serving an earlier story for the same request
+STORY_SEED = int(os.environ["STORYWRITER_SEED"]) if os.getenv("STORYWRITER_SEED") else None
+CACHE_POLICY = os.getenv("STORYWRITER_CACHE", "off")
+CACHE_ENABLED = STORY_SEED is not None or CACHE_POLICY == "reuse"
+CACHE_TTL = float(os.getenv("STORYWRITER_CACHE_TTL", 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("STORYWRITER_CACHE_MAX_ENTRIES", 256))
+# Set to a directory to keep cached stories across restarts
+CACHE_DIR = os.getenv("STORYWRITER_CACHE_DIR")
+
+# Shared keep-alive HTTP client; created lazily on the server's event loop
+http_client = None
+# (model, temperature) -> ChatGroq, all sharing http_client's connection pool
+llms = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+        # Models built on a closed client can no longer make requests
+        llms.clear()
+    return http_client
+
+
+def get_llm(model: str = STORY_MODEL, temperature: float = STORY_TEMPERATURE) -> ChatGroq:
+    """Shared ChatGroq for a model and temperature, built on first use"""
+    client = get_http_client()
+    key = (model, temperature)
+    llm = llms.get(key)
+    if llm is None:
+        options = {"base_url": GROQ_BASE_URL} if GROQ_BASE_URL else {}
+        if STORY_SEED is not None:
+            options["model_kwargs"] = {"seed": STORY_SEED}
+        llm = ChatGroq(model=model, temperature=temperature,
+                       http_async_client=client, **options)
+        llms[key] = llm
+    return llm
+
+
+class StoryCache:
+    """Exact-match cache of generated stories: an in-memory LRU tier and an
+    optional on-disk tier (one JSON file per entry), both with a TTL"""
+
+    def __init__(self, max_entries: int, ttl: float, cache_dir: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()  # key -> (stored_at, text)
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(prompt: str, model: str, temperature: float) -> str:
+        rendered = json.dumps([prompt, model, temperature, STORY_SEED])
+        return hashlib.sha256(rendered.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, entry: dict):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    def _remember(self, key: str, stored_at: float, text: str):
+        self.entries[key] = (stored_at, text)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry[0] <= self.ttl:
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+        self.entries.pop(key, None)
+        if self.cache_dir:
+            stored = await asyncio.to_thread(self._read_disk, key)
+            if stored and time.time() - stored["stored_at"] <= self.ttl:
+                self._remember(key, stored["stored_at"], stored["text"])
+                self.stats["disk_hits"] += 1
+                return stored["text"]
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, text: str):
+        stored_at = time.time()
+        self._remember(key, stored_at, text)
+        if self.cache_dir:
+            await asyncio.to_thread(self._write_disk, key, {"stored_at": stored_at, "text": text})
+
+
+story_cache = StoryCache(CACHE_MAX_ENTRIES, CACHE_TTL, CACHE_DIR) if CACHE_ENABLED else None
+
+
+async def generate_story(prompt: str, fresh: bool = False):
+    """Story text for a prompt and whether it came from the cache"""
+    llm = get_llm()
+    if story_cache is None:
+        response = await llm.ainvoke(prompt)
+        return response.content, False
+
+    key = StoryCache.key(prompt, STORY_MODEL, STORY_TEMPERATURE)
+    if fresh:
+        story_cache.stats["bypassed"] += 1
+    else:
+        text = await story_cache.get(key)
+        if text is not None:
+            return text, True
+    response = await llm.ainvoke(prompt)
+    await story_cache.put(key, response.content)
+    return response.content, False
+
+
+def split_paragraphs(text: str) -> list:
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+class Story:
+    """A generated story, kept as paragraphs so continuations just append"""
+
+    def __init__(self, story_id: str, topic: str, text: str):
+        self.id = story_id
+        self.topic = topic
+        self.paragraphs = split_paragraphs(text)
+        self.word_count = len(text.split())
+        # Rolling summary of paragraphs[:summarized], refreshed in the background
+        # after each continuation; stories never continued are not summarized
+        self.summary = ""
+        self.summarized = 0
+        self.summarizing = False
+
+    def append(self, text: str):
+        self.paragraphs.extend(split_paragraphs(text))
+        self.word_count += len(text.split())
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(self.paragraphs)
+
+
+class StoryStore:
+    """SQLite store of stories by id, least recently used dropped first.
+
+    Stories live on disk rather than in this process, so every pooled
+    session of the server (and a respawned one) can continue them.
+    """
+
+    def __init__(self, path: str, max_stories: int):
+        self.path = path
+        self.max_stories = max_stories
+        self.conn = sqlite3.connect(path, isolation_level=None, timeout=10.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS stories ("
+            " id TEXT PRIMARY KEY,"
+            " topic TEXT NOT NULL,"
+            " paragraphs TEXT NOT NULL,"
+            " word_count INTEGER NOT NULL,"
+            " summary TEXT NOT NULL DEFAULT '',"
+            " summarized INTEGER NOT NULL DEFAULT 0,"
+            " accessed_at REAL NOT NULL)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS stories_accessed_at ON stories (accessed_at)")
+
+    def add(self, topic: str, text: str) -> Story:
+        story = Story(uuid.uuid4().hex[:8], topic, text)
+        self.conn.execute(
+            "INSERT INTO stories (id, topic, paragraphs, word_count, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (story.id, topic, json.dumps(story.paragraphs), story.word_count, time.time()))
+        self.conn.execute(
+            "DELETE FROM stories WHERE id IN (SELECT id FROM stories"
+            " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_stories,))
+        return story
+
+    def get(self, story_id: str):
+        story_id = story_id.strip()
+        row = self.conn.execute(
+            "SELECT topic, paragraphs, word_count, summary, summarized"
+            " FROM stories WHERE id = ?", (story_id,)).fetchone()
+        if row is None:
+            return None
+        self.conn.execute(
+            "UPDATE stories SET accessed_at = ? WHERE id = ?", (time.time(), story_id))
+        story = Story(story_id, row[0], "")
+        story.paragraphs = json.loads(row[1])
+        story.word_count, story.summary, story.summarized = row[2], row[3], row[4]
+        return story
+
+    def save(self, story: Story):
+        """Store a story's paragraphs after a continuation."""
+        self.conn.execute(
+            "UPDATE stories SET paragraphs = ?, word_count = ?, accessed_at = ? WHERE id = ?",
+            (json.dumps(story.paragraphs), story.word_count, time.time(), story.id))
+
+    def save_summary(self, story: Story):
+        """Store a refreshed summary, unless another process stored a newer one."""
+        self.conn.execute(
+            "UPDATE stories SET summary = ?, summarized = ? WHERE id = ? AND summarized < ?",
+            (story.summary, story.summarized, story.id, story.summarized))
+
+    def close(self):
+        self.conn.close()
+
+
+stories = StoryStore(STORY_DB_PATH, MAX_STORIES)
+summary_tasks = set()
+
+
+def extractive_summary(paragraphs: list, max_words: int = SUMMARY_WORDS) -> str:
+    """Opening sentence of each paragraph, dropping the earliest (after the
+    first) until it fits; used until the LLM summary catches up"""
+    sentences = [re.split(r"(?<=[.!?])\s", p, maxsplit=1)[0] for p in paragraphs]
+    while len(sentences) > 2 and sum(len(s.split()) for s in sentences) > max_words:
+        del sentences[1]
+    return " ".join(sentences)
+
+
+def story_context(story: Story):
+    """Summary of everything before the tail, and the tail paragraphs"""
+    head = len(story.paragraphs) - TAIL_PARAGRAPHS
+    if head <= 0:
+        return "", story.paragraphs
+    summary = story.summary
+    if story.summarized < head:
+        gap = extractive_summary(story.paragraphs[story.summarized:head])
+        summary = f"{summary} {gap}".strip()
+    return summary, story.paragraphs[head:]
+
+
+async def refresh_summary(story: Story):
+    """Fold paragraphs that left the tail into the story's rolling summary"""
+    head = len(story.paragraphs) - TAIL_PARAGRAPHS
+    if head <= story.summarized or story.summarizing:
+        return
+    story.summarizing = True
+    new_text = "\n\n".join(story.paragraphs[story.summarized:head])
+    previous = f"Summary so far:\n{story.summary}\n\n" if story.summary else ""
+    prompt = f"""{previous}New passages of the story:
+
+{new_text}
+
+Write an updated summary of the whole story in at most {SUMMARY_WORDS} words. Cover the main characters, setting, key events and any unresolved threads. Reply with the summary only."""
+    try:
+        response = await get_llm(temperature=SUMMARY_TEMPERATURE).ainvoke(prompt)
+        story.summary = response.content.strip()
+        story.summarized = head
+        stories.save_summary(story)
+    except Exception:
+        # continue_story falls back to an extractive summary of the gap
+        pass
+    finally:
+        story.summarizing = False
+
+
+def schedule_summary(story: Story):
+    task = asyncio.create_task(refresh_summary(story))
+    summary_tasks.add(task)
+    task.add_done_callback(summary_tasks.discard)
+
+
+def story_footer(story: Story) -> str:
+    return f"[story_id: {story.id} - pass it to continue_story or get_story]"
+
+
+@asynccontextmanager
+async def lifespan(server):
+    try:
+        yield
+    finally:
+        for task in list(summary_tasks):
+            task.cancel()
+        llms.clear()
+        if http_client is not None:
+            await http_client.aclose()
+        stories.close()
+
+
+mcp = FastMCP("storywriter", lifespan=lifespan)
 
 
 @mcp.tool()
-async def write_story(topic: str, genre: str = "general", length: str = "medium") -> str:
-    """Write a creative story based on topic, genre, and length preferences"""
-    llm = ChatGroq(model="llama3-70b-8192", temperature=0.8)
+async def write_story(topic: str, genre: str = "general", length: str = "medium", fresh: bool = False) -> str:
+    """Write a creative story based on topic, genre, and length preferences.
+    Set fresh to skip the result cache"""
 
     # Determine word count based on length parameter
     word_counts = {
@@ -43,39 +363,43 @@ STORY STRUCTURE:
 Please write a complete, well-developed story that fully explores the theme of {topic}. Make it engaging, detailed, and emotionally resonant. Don't rush the narrative - take time to develop each scene fully."""
 
     try:
-        response = await llm.ainvoke(prompt)
-        story_content = response.content
+        story_content, cached = await generate_story(prompt, fresh)
+
+        story = stories.add(topic, story_content)
 
         # Add word count for reference
         word_count = len(story_content.split())
-        return f"{story_content}\n\n[Word count: approximately {word_count} words]"
+        cached_note = " (cached)" if cached else ""
+        return (f"{story_content}\n\n[Word count: approximately {word_count} words{cached_note}]\n"
+                f"{story_footer(story)}")
 
     except Exception as e:
         return f"Error generating story: {str(e)}"
 
 
 @mcp.tool()
-async def write_short_story(topic: str) -> str:
+async def write_short_story(topic: str, fresh: bool = False) -> str:
     """Write a short story (300-400 words)"""
-    return await write_story(topic, "general", "short")
+    return await write_story(topic, "general", "short", fresh)
 
 
 @mcp.tool()
-async def write_long_story(topic: str) -> str:
+async def write_long_story(topic: str, fresh: bool = False) -> str:
     """Write a long story (700-800 words)"""
-    return await write_story(topic, "general", "long")
+    return await write_story(topic, "general", "long", fresh)
 
 
 @mcp.tool()
-async def write_genre_story(topic: str, genre: str) -> str:
+async def write_genre_story(topic: str, genre: str, fresh: bool = False) -> str:
     """Write a story in a specific genre (500-600 words)"""
-    return await write_story(topic, genre, "medium")
+    return await write_story(topic, genre, "medium", fresh)
 
 
 @mcp.tool()
-async def write_detailed_story(topic: str, setting: str = "", characters: str = "", mood: str = "") -> str:
-    """Write a detailed story with specific requirements"""
-    llm = ChatGroq(model="llama3-70b-8192", temperature=0.8)
+async def write_detailed_story(topic: str, setting: str = "", characters: str = "", mood: str = "",
+                               fresh: bool = False) -> str:
+    """Write a detailed story with specific requirements. Set fresh to skip
+    the result cache"""
 
     # Build detailed prompt with additional context
     context_parts = []
@@ -113,27 +437,42 @@ WRITING STYLE:
 Please write a complete, publication-quality story that fully develops the theme of {topic}. Take your time with each scene and make every word count."""
 
     try:
-        response = await llm.ainvoke(prompt)
-        story_content = response.content
+        story_content, cached = await generate_story(prompt, fresh)
+
+        story = stories.add(topic, story_content)
 
         # Add word count for reference
         word_count = len(story_content.split())
-        return f"{story_content}\n\n[Word count: approximately {word_count} words]"
+        cached_note = " (cached)" if cached else ""
+        return (f"{story_content}\n\n[Word count: approximately {word_count} words{cached_note}]\n"
+                f"{story_footer(story)}")
 
     except Exception as e:
         return f"Error generating detailed story: {str(e)}"
 
 
 @mcp.tool()
-async def continue_story(existing_story: str, direction: str = "") -> str:
-    """Continue an existing story in a specified direction"""
-    llm = ChatGroq(model="llama3-70b-8192", temperature=0.8)
-
+async def continue_story(story_id: str = "", direction: str = "", existing_story: str = "") -> str:
+    """Continue a story in a specified direction. Pass the story_id returned by
+    the write tools; existing_story (the full text) is only needed for stories
+    written elsewhere"""
+    story = stories.get(story_id) if story_id else None
+    if story is None:
+        if not existing_story:
+            return f"Error continuing story: unknown story_id '{story_id}'"
+        story = stories.add("", existing_story)
+
+    summary, tail = story_context(story)
+    summary_prompt = f"Summary of the story so far:\n{summary}\n\n" if summary else ""
+    tail_text = "\n\n".join(tail)
     direction_prompt = f" Continue the story in this direction: {direction}" if direction else ""
+    llm = get_llm()
 
-    prompt = f"""You are continuing an existing story. Here's what has been written so far:
+    prompt = f"""You are continuing an existing story.
 
-{existing_story}
+{summary_prompt}Here is how the story currently ends:
+
+{tail_text}
 
 Please continue this story for another 300-400 words.{direction_prompt}
 
@@ -150,12 +489,44 @@ Write a seamless continuation that feels like a natural part of the original sto
     try:
         response = await llm.ainvoke(prompt)
         continuation = response.content
+        story.append(continuation)
+        stories.save(story)
+        schedule_summary(story)
 
         word_count = len(continuation.split())
-        return f"{continuation}\n\n[Continuation word count: approximately {word_count} words]"
+        return (f"{continuation}\n\n[Continuation word count: approximately {word_count} words, "
+                f"story total: {story.word_count} words]\n{story_footer(story)}")
 
     except Exception as e:
         return f"Error continuing story: {str(e)}"
 
+
+@mcp.tool()
+async def get_story(story_id: str) -> str:
+    """Get the full text of a story written or continued earlier"""
+    story = stories.get(story_id)
+    if story is None:
+        return f"Error: unknown story_id '{story_id}'"
+    return f"{story.text}\n\n[Word count: approximately {story.word_count} words]\n{story_footer(story)}"
+
+@mcp.resource("stats://story-cache")
+def story_cache_stats() -> str:
+    """Story result cache hit rate (a resource, so it stays out of the LLM's
+    tool list)"""
+    if story_cache is None:
+        return json.dumps({"enabled": False, "policy": CACHE_POLICY, "seed": STORY_SEED})
+    stats = story_cache.stats
+    hits = stats["hits"] + stats["disk_hits"]
+    lookups = hits + stats["misses"]
+    return json.dumps({
+        "enabled": True,
+        "policy": CACHE_POLICY,
+        "seed": STORY_SEED,
+        **stats,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "entries": len(story_cache.entries),
+    })
+
+
 if __name__ == "__main__":
     mcp.run(transport="stdio")
@@ -0,0 +1,59 @@
+"""HistoryCompactor keeps the model's history within its token budget."""
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compaction import HistoryCompactor  # noqa: E402
+
+
+def turn(n, tool_chars):
+    call = {"name": "write_story", "args": {"topic": f"topic {n}"}, "id": f"call_{n}",
+            "type": "tool_call"}
+    return [
+        HumanMessage(content=f"question {n}"),
+        AIMessage(content="", tool_calls=[call]),
+        ToolMessage(content="x" * tool_chars, tool_call_id=f"call_{n}", name="write_story"),
+        AIMessage(content=f"answer {n}"),
+    ]
+
+
+def paired(messages):
+    calls = {c["id"] for m in messages if isinstance(m, AIMessage) for c in m.tool_calls}
+    results = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    return calls == results
+
+
+def test_old_turns_dropped_when_recent_fit():
+    compactor = HistoryCompactor(max_tokens=1000, keep_last_turns=2, tool_output_chars=100)
+    messages = [m for n in range(6) for m in turn(n, 1200)]
+    compacted = compactor.compact(messages)
+    assert compactor._count(compacted) <= 1000
+    assert compacted[-4:] == messages[-4:]
+    assert paired(compacted)
+
+
+def test_recent_turns_over_budget_are_cut_to_fit():
+    compactor = HistoryCompactor(max_tokens=1000, keep_last_turns=2, tool_output_chars=100)
+    messages = [m for n in range(4) for m in turn(n, 8000)]
+    compacted = compactor.compact(messages)
+    assert compactor._count(compacted) <= 1000
+    assert compacted[-1].content == "answer 3"
+    assert any(m.content == "question 2" for m in compacted)
+    assert all(len(m.content) < 200 for m in compacted if isinstance(m, ToolMessage))
+    assert paired(compacted)
+
+
+def test_recent_window_shrinks_to_current_turn():
+    compactor = HistoryCompactor(max_tokens=200, keep_last_turns=3, tool_output_chars=400)
+    messages = [m for n in range(3) for m in turn(n, 4000)]
+    compacted = compactor.compact(messages)
+    assert compactor._count(compacted) <= 200
+    assert [m.content for m in compacted if isinstance(m, HumanMessage)] == ["question 2"]
+    assert "2 earlier conversation turn(s) omitted" in compacted[0].content
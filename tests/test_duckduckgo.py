@@ -0,0 +1,157 @@
+"""Search cache, in-flight dedup, result budget and multi-query merge of the
+search server, against a stub search backend."""
+import asyncio
+import importlib
+import json
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastmcp")
+pytest.importorskip("duckduckgo_search")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FOOTER_RE = re.compile(r"\[(\d+) of (\d+) results, (\d+) chars, ~(\d+) tokens\]")
+
+
+class StubBackend:
+    """Deterministic results per query, counting calls; "fail" raises."""
+
+    def __init__(self, delay=0.0, results=None):
+        self.delay = delay
+        self.results = results or {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, query, max_results):
+        with self._lock:
+            self.calls.append(query)
+        if self.delay:
+            time.sleep(self.delay)
+        if query == "fail":
+            raise RuntimeError("backend down")
+        if query in self.results:
+            return self.results[query][:max_results]
+        return [
+            {"title": f"{query} {i}", "href": f"https://example.com/{query}/{i}",
+             "body": f"Result {i} about {query}. " * 3}
+            for i in range(max_results)
+        ]
+
+
+@pytest.fixture
+def search(monkeypatch):
+    monkeypatch.setenv("SEARCH_CACHE_MAX_ENTRIES", "2")
+    monkeypatch.delenv("SEARCH_CACHE_PATH", raising=False)
+    module = importlib.reload(importlib.import_module("duckduckgo_mcp"))
+    yield module
+    module.search_executor.shutdown(wait=True)
+
+
+def call(tool, *args, **kwargs):
+    fn = getattr(tool, "fn", tool)
+    result = fn(*args, **kwargs)
+    return asyncio.run(result) if asyncio.iscoroutine(result) else result
+
+
+def footer(output):
+    found = FOOTER_RE.search(output.splitlines()[-1])
+    assert found, output
+    return tuple(int(n) for n in found.groups())
+
+
+def test_repeat_query_served_from_cache(search):
+    backend = StubBackend()
+    search.set_search_backend(backend)
+
+    first = call(search.search_web, "rust async")
+    second = call(search.search_web, "  Rust   ASYNC ")
+    assert first == second
+    assert backend.calls == ["rust async"]
+
+    stats = json.loads(call(search.search_stats))
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    assert stats["latency_p95_ms"] is not None
+
+
+def test_cache_evicts_least_recently_used_and_expired(search):
+    backend = StubBackend()
+    search.set_search_backend(backend)
+
+    for query in ("a", "b", "a", "c"):  # max 2 entries: "b" is evicted
+        call(search.search_web, query)
+    call(search.search_web, "a")
+    call(search.search_web, "b")
+    assert backend.calls == ["a", "b", "c", "b"]
+
+    key = search.cache_key("b", 3)
+    stored_at, results = search.cache.entries[key]
+    search.cache.entries[key] = (stored_at - search.CACHE_TTL - 1, results)
+    call(search.search_web, "b")
+    assert backend.calls[-1] == "b" and len(backend.calls) == 5
+
+
+def test_concurrent_identical_queries_share_one_search(search):
+    backend = StubBackend(delay=0.2)
+    search.set_search_backend(backend)
+
+    async def burst():
+        fn = getattr(search.search_web, "fn", search.search_web)
+        return await asyncio.gather(*(fn("same query") for _ in range(5)))
+
+    outputs = asyncio.run(burst())
+    assert len(set(outputs)) == 1
+    assert backend.calls == ["same query"]
+    assert search.in_flight == {}
+
+
+def test_output_fits_token_budget(search):
+    long_body = "word " * 200
+    backend = StubBackend(results={"big": [
+        {"title": f"Title {i}", "href": f"https://site{i}.org/page", "body": long_body}
+        for i in range(10)
+    ]})
+    search.set_search_backend(backend)
+
+    output = call(search.search_web, "big", max_results=10, snippet_chars=120, max_tokens=100)
+    shown, total, chars, tokens = footer(output)
+    assert total == 10 and 0 < shown < 10
+    assert tokens <= 100
+    assert chars == sum(len(line) for line in output.splitlines()[:-1])
+    assert all(len(line) < 200 for line in output.splitlines()[:-1])
+
+    urls = call(search.search_web, "big", max_results=10, max_tokens=100, urls_only=True)
+    assert all(re.search(r"<https://site\d\.org/page>", line) for line in urls.splitlines()[:-1])
+
+
+def test_search_many_merges_duplicates(search):
+    shared_body = "The Rust async book explains futures executors and wakers in depth"
+    backend = StubBackend(results={
+        "rust futures": [
+            {"title": "Async book", "href": "https://rust-lang.github.io/async-book/",
+             "body": shared_body},
+            {"title": "Tokio", "href": "https://tokio.rs", "body": "Tokio runtime tutorial"},
+        ],
+        "rust async": [
+            {"title": "Async book", "href": "http://www.rust-lang.github.io/async-book",
+             "body": shared_body},
+            {"title": "Mirror", "href": "https://mirror.example/async",
+             "body": shared_body + " online"},
+        ],
+    })
+    search.set_search_backend(backend)
+
+    output = call(search.search_many, ["rust futures", "rust async", "rust futures", "fail"])
+    lines = output.splitlines()
+    assert lines[0].startswith("[2/3] Async book")
+    assert lines[1].startswith("[1/3] Tokio")
+    assert sum("Async book" in line or "Mirror" in line for line in lines) == 1
+    assert lines[-1] == "Failed queries: fail"
+    assert footer("\n".join(lines[:-1]))[:2] == (2, 2)
+    assert sorted(backend.calls) == ["fail", "rust async", "rust futures"]
+    assert json.loads(call(search.search_stats))["errors"] == 1
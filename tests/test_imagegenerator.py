@@ -0,0 +1,137 @@
+"""generate_image against a local stub Pollinations server, in process and
+over a stdio MCP session."""
+import asyncio
+import importlib
+import json
+import os
+import struct
+import sys
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastmcp")
+pytest.importorskip("httpx")
+pytest.importorskip("PIL")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def png_bytes(width=4, height=4):
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    rows = b"".join(b"\x00" + b"\xff\x00\x00" * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows))
+            + chunk(b"IEND", b""))
+
+
+@pytest.fixture
+def stub_pollinations():
+    body = png_bytes()
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests
+    server.shutdown()
+
+
+@pytest.fixture
+def imagegenerator(tmp_path, monkeypatch, stub_pollinations):
+    url, _ = stub_pollinations
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("POLLINATIONS_BASE_URL", url)
+    monkeypatch.setenv("IMAGE_WORKERS", "1")
+    module = importlib.reload(importlib.import_module("imagegenerator_mcp"))
+    yield module
+    if module.image_workers is not None:
+        module.image_workers.shutdown()
+
+
+def call(tool, *args):
+    fn = getattr(tool, "fn", tool)
+
+    async def run(module):
+        try:
+            return await fn(*args)
+        finally:
+            if module.http_client is not None:
+                await module.http_client.aclose()
+                module.http_client = None
+
+    return run
+
+
+def test_generate_image_downloads_then_reuses(imagegenerator, stub_pollinations, tmp_path):
+    _, requests = stub_pollinations
+    generate = call(imagegenerator.generate_image, "a red square")
+
+    first = asyncio.run(generate(imagegenerator))
+    assert not isinstance(first, str), first
+    text, link = first
+    assert "Image generated successfully" in text.text
+    assert link.mimeType == "image/png"
+    assert Path(link.meta["path"]).exists()
+    assert Path(link.meta["thumbnail"]).exists()
+
+    second = asyncio.run(generate(imagegenerator))
+    assert not isinstance(second, str), second
+    assert second[1].name == link.name
+    assert len(requests) == 1
+
+    manifest = tmp_path / "generated_images" / "manifest.jsonl"
+    events = [json.loads(line)["event"] for line in manifest.read_text().splitlines()]
+    assert events == ["created", "reused"]
+
+
+def test_generate_images_reports_each_result(imagegenerator):
+    result = asyncio.run(call(imagegenerator.generate_images, ["a", "b"])(imagegenerator))
+    assert not isinstance(result, str), result
+    assert result[0].text.startswith("Generated 2 of 2 images")
+    assert len(result) == 3
+
+
+def test_generate_image_over_stdio(stub_pollinations, tmp_path):
+    """The tool as the agent calls it: a server process on a stdio session,
+    with thumbnails made in the worker pool."""
+    pytest.importorskip("mcp")
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    url, _ = stub_pollinations
+    script = Path(__file__).resolve().parent.parent / "imagegenerator_mcp.py"
+    params = StdioServerParameters(
+        command=sys.executable, args=[str(script)], cwd=str(tmp_path),
+        env={**os.environ, "POLLINATIONS_BASE_URL": url, "IMAGE_WORKERS": "1"})
+
+    async def run():
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                return await asyncio.wait_for(
+                    session.call_tool("generate_image", {"prompt": "a red square"}), 30)
+
+    result = asyncio.run(run())
+    assert not result.isError, result
+    assert "Image generated successfully" in result.content[0].text
+    link = result.content[1]
+    assert (tmp_path / link.meta["thumbnail"]).exists()
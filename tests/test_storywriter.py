@@ -0,0 +1,105 @@
+"""Stories written on one pooled storywriter session can be continued on
+another, against a local stub Groq endpoint."""
+import asyncio
+import json
+import os
+import sys
+import threading
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastmcp")
+pytest.importorskip("langchain_groq")
+pytest.importorskip("mcp")
+
+from mcp import ClientSession, StdioServerParameters  # noqa: E402
+from mcp.client.stdio import stdio_client  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from session_pool import SessionPool  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def stub_groq():
+    replies = iter(f"Paragraph {i} of the story." for i in range(1000))
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = json.dumps({
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "test",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": next(replies)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 5, "total_tokens": 6},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+class StdioClient:
+    """The part of MCPClient that SessionPool uses: one stdio session per call."""
+
+    def __init__(self, params: StdioServerParameters):
+        self.params = params
+
+    @asynccontextmanager
+    async def session(self, server_name: str):
+        async with stdio_client(self.params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+
+
+def test_continue_story_on_another_session(stub_groq, tmp_path):
+    params = StdioServerParameters(
+        command=sys.executable, args=[str(ROOT / "storywriter_mcp.py")], cwd=str(tmp_path),
+        env={**os.environ, "STORYWRITER_BASE_URL": stub_groq, "GROQ_API_KEY": "test"})
+
+    async def run():
+        pool = SessionPool(StdioClient(params), "storywriter", size=2, health_check_interval=0)
+        await pool.start()
+        try:
+            async def call(name, arguments):
+                async with pool.checkout() as session:
+                    result = await asyncio.wait_for(session.call_tool(name, arguments), 30)
+                    return id(session), result.content[0].text
+
+            first, written = await call("write_story", {"topic": "a lighthouse"})
+            story_id = written.rsplit("[story_id: ", 1)[1].split(" ", 1)[0]
+            second, continued = await call("continue_story", {"story_id": story_id})
+            third, full = await call("get_story", {"story_id": story_id})
+            return story_id, (first, second, third), written, continued, full
+        finally:
+            await pool.aclose()
+
+    story_id, sessions, written, continued, full = asyncio.run(run())
+    assert sessions[0] != sessions[1]
+    assert not continued.startswith("Error"), continued
+    assert f"[story_id: {story_id}" in continued
+    assert not full.startswith("Error"), full
+    assert "Paragraph 0" in full and "Paragraph 1" in full